@@ -0,0 +1,14 @@
+# Benchmarks package
+import os
+import tempfile
+
+# Generated audio, the cache index and the call state and queue databases go
+# to a scratch directory removed on exit, never into the working tree
+_scratch = tempfile.TemporaryDirectory(prefix="benchmarks-")
+os.environ.setdefault("AUDIO_DIR", os.path.join(_scratch.name, "audio_files"))
+os.environ.setdefault(
+    "CALL_STATE_SQLITE_PATH", os.path.join(_scratch.name, "call_state.db")
+)
+os.environ.setdefault(
+    "CALL_QUEUE_SQLITE_PATH", os.path.join(_scratch.name, "call_queue.db")
+)
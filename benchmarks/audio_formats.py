@@ -0,0 +1,92 @@
+"""
+Benchmark: bytes written, Twilio fetch size and synthesis time per format
+
+For each supported ElevenLabs output format, synthesizes a set of messages
+through the TTS layer, then fetches the files through the /audio route the
+way Twilio does. By default ElevenLabs is simulated with payloads sized from
+each format's bitrate; pass --live to call the real API (needs
+ELEVENLABS_API_KEY and uses quota).
+
+Usage: python -m benchmarks.audio_formats [--live]
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+LIVE = "--live" in sys.argv
+if not LIVE:
+    os.environ.setdefault("ELEVENLABS_API_KEY", "benchmark")
+
+import httpx  # noqa: E402
+from main import app  # noqa: E402
+from config import AUDIO_DIR  # noqa: E402
+from utils import elevenlabs  # noqa: E402
+from utils.audio_formats import AUDIO_FORMATS, get_audio_format  # noqa: E402
+
+MESSAGES = [
+    "Hi, this is a reminder that your appointment is tomorrow at 3 PM.",
+    "Your order has shipped and will arrive within two business days. "
+    "Reply STOP to opt out of further notifications.",
+    "Thanks for calling. Press 1 to confirm, or press 2 to speak to an agent.",
+]
+
+# Bits per second of each format, used to size simulated payloads
+BITRATES = {
+    "mp3_44100_128": 128_000,
+    "mp3_44100_64": 64_000,
+    "mp3_44100_32": 32_000,
+    "mp3_22050_32": 32_000,
+    "ulaw_8000": 64_000,
+}
+CHARS_PER_SECOND = 15
+UPSTREAM_THROUGHPUT = 2_000_000  # simulated bytes/second from ElevenLabs
+
+
+async def fake_elevenlabs(request: httpx.Request) -> httpx.Response:
+    output_format = request.url.params["output_format"]
+    text = request.read().decode("utf-8")
+    size = int(BITRATES[output_format] / 8 * len(text) / CHARS_PER_SECOND)
+    await asyncio.sleep(0.2 + size / UPSTREAM_THROUGHPUT)
+    return httpx.Response(200, content=b"\x00" * size)
+
+
+async def run_format(client: httpx.AsyncClient, output_format: str):
+    elevenlabs.OUTPUT_FORMAT = output_format
+    elevenlabs.AUDIO_FORMAT = get_audio_format(output_format)
+
+    written = fetched = 0
+    synth_ms = []
+    content_types = set()
+    for message in MESSAGES:
+        # Unique text per run so every synthesis misses the cache
+        text = f"{message} ({output_format} {time.time_ns()})"
+        start = time.perf_counter()
+        filenames = await elevenlabs.synthesize_text(text)
+        synth_ms.append((time.perf_counter() - start) * 1000)
+        for filename in filenames or []:
+            written += os.path.getsize(os.path.join(AUDIO_DIR, filename))
+            response = await client.get(f"/audio/{filename}")
+            fetched += len(response.content)
+            content_types.add(response.headers.get("content-type"))
+
+    print(
+        f"{output_format:<15} written={written:>8}B fetched={fetched:>8}B "
+        f"synth_avg={sum(synth_ms) / len(synth_ms):7.1f}ms "
+        f"content_type={','.join(sorted(filter(None, content_types)))}"
+    )
+
+
+async def main():
+    transport = None if LIVE else httpx.MockTransport(fake_elevenlabs)
+    await elevenlabs.start_client(transport=transport)
+    asgi = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=asgi, base_url="http://bench") as client:
+        for output_format in AUDIO_FORMATS:
+            await run_format(client, output_format)
+    await elevenlabs.close_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,126 @@
+"""
+Benchmark: serving audio from a replica that didn't generate it
+
+Replica A synthesizes messages with the fake TTS provider and publishes them
+to an S3-compatible store. Replica B is simulated by wiping the local audio
+directory and cache index, then fetching every file through /audio (pulled
+from the store on demand) and re-requesting the same texts (store hits
+instead of new syntheses).
+
+By default the store is an in-memory stand-in for S3/MinIO behind an httpx
+MockTransport. Pass --live to use the bucket configured by the
+AUDIO_STORE_S3_* variables instead (e.g. a local MinIO container).
+
+Usage: python -m benchmarks.audio_store [messages] [--live]
+"""
+
+import os
+import sys
+import time
+import statistics
+
+LIVE = "--live" in sys.argv
+os.environ["TTS_PROVIDER"] = "fake"
+os.environ.setdefault("FAKE_TTS_SEED", "42")
+os.environ.setdefault("FAKE_TTS_ERROR_RATE", "0")
+os.environ["AUDIO_STORE"] = "s3"
+if not LIVE:
+    os.environ["AUDIO_STORE_S3_ENDPOINT"] = "http://s3.bench"
+    os.environ["AUDIO_STORE_S3_BUCKET"] = "bench"
+
+import asyncio  # noqa: E402
+import httpx  # noqa: E402
+from config import AUDIO_DIR  # noqa: E402
+from main import app  # noqa: E402
+from utils import elevenlabs, metrics  # noqa: E402
+from utils.audio_cache import audio_cache  # noqa: E402
+from utils.audio_store import audio_store  # noqa: E402
+
+objects = {}
+
+
+def fake_s3(request: httpx.Request) -> httpx.Response:
+    """Minimal S3 object API: PUT and GET by path, SigV4 header required"""
+    if not request.headers.get("authorization", "").startswith("AWS4-HMAC-SHA256"):
+        return httpx.Response(403, text="AccessDenied")
+    if request.method == "PUT":
+        if "transfer-encoding" in request.headers:
+            return httpx.Response(501, text="NotImplemented: chunked upload")
+        objects[request.url.path] = (
+            request.content,
+            request.headers.get("x-amz-meta-sha256", ""),
+        )
+        return httpx.Response(200)
+    if request.url.path not in objects:
+        return httpx.Response(404, text="NoSuchKey")
+    body, digest = objects[request.url.path]
+    return httpx.Response(200, content=body, headers={"x-amz-meta-sha256": digest})
+
+
+def summarize(name: str, latencies):
+    latencies.sort()
+    print(
+        f"{name:<24} n={len(latencies)} "
+        f"p50={statistics.median(latencies):.1f}ms "
+        f"p99={latencies[int(len(latencies) * 0.99) - 1]:.1f}ms"
+    )
+
+
+async def main(messages: int):
+    if not LIVE:
+        await audio_store.start(transport=httpx.MockTransport(fake_s3))
+    await elevenlabs.start_client()
+    texts = [
+        f"Audio store benchmark message {i} ({time.time_ns()})."
+        for i in range(messages)
+    ]
+
+    synth = []
+    filenames = []
+    for text in texts:
+        start = time.perf_counter()
+        filenames.append(await elevenlabs.synthesize_audio(text))
+        synth.append((time.perf_counter() - start) * 1000)
+
+    # Become "replica B": nothing generated here yet
+    for filename in filenames:
+        key = filename.split(".")[0]
+        audio_cache.discard(key)
+        os.remove(os.path.join(AUDIO_DIR, filename))
+
+    served = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        for filename in filenames:
+            start = time.perf_counter()
+            response = await client.get(f"/audio/{filename}")
+            served.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.status_code
+
+    # And once more for the texts themselves, after a local wipe
+    for filename in filenames:
+        audio_cache.discard(filename.split(".")[0])
+        os.remove(os.path.join(AUDIO_DIR, filename))
+    restored = []
+    for text in texts:
+        start = time.perf_counter()
+        await elevenlabs.synthesize_audio(text)
+        restored.append((time.perf_counter() - start) * 1000)
+    await elevenlabs.close_client()
+
+    counters = metrics.snapshot()["counters"]
+    summarize("synthesize + upload", synth)
+    summarize("serve missing file", served)
+    summarize("synthesize (store hit)", restored)
+    print(
+        f"uploads={counters.get('audio_store_uploads', 0)} "
+        f"store_hits={counters.get('audio_store_hits', 0)} "
+        f"upload_failures={counters.get('audio_store_upload_failures', 0)}"
+    )
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if a != "--live"]
+    asyncio.run(main(int(args[0]) if args else 50))
@@ -0,0 +1,67 @@
+"""
+Benchmark: POST /call/batch dispatch rate against a local fake Twilio API
+
+Submits one batch of N recipients (one broadcast message, so a single
+synthesis), streams its results and reports calls per minute. The calls
+are placed by the call queue workers. The fake Twilio API takes
+TWILIO_LATENCY seconds per call creation; the dispatch rate should
+approach CALL_QUEUE_WORKERS / TWILIO_LATENCY.
+
+Usage: python -m benchmarks.call_batch [recipients] [latency_ms]
+"""
+
+import sys
+import json
+import time
+import asyncio
+
+# Also sets up the fake TTS and Twilio environment before the app is imported
+from benchmarks.call_dispatch import start_fake_twilio
+
+import httpx  # noqa: E402
+from main import app  # noqa: E402
+from config import twilio_client, CALL_QUEUE_WORKERS  # noqa: E402
+
+
+async def main(recipients: int, latency_ms: float):
+    twilio_client.api.base_url = start_fake_twilio(latency_ms / 1000)
+    transport = httpx.ASGITransport(app=app)
+    # The lifespan opens the clients and runs the call queue workers
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+        start = time.perf_counter()
+        response = await client.post(
+            "/call/batch",
+            json={
+                "message": "Your appointment is tomorrow at 3 PM. Press 1 to confirm.",
+                "phone_numbers": [f"+1{i:010d}" for i in range(1, recipients + 1)],
+            },
+        )
+        response.raise_for_status()
+        accepted = time.perf_counter() - start
+
+        batch_id = response.json()["batch_id"]
+        async with client.stream("GET", f"/call/batch/{batch_id}/stream") as stream:
+            async for line in stream.aiter_lines():
+                summary = json.loads(line)
+        elapsed = time.perf_counter() - start
+
+    print(
+        f"recipients={recipients} workers={CALL_QUEUE_WORKERS} "
+        f"twilio_latency={latency_ms:g}ms accepted in {accepted * 1000:.0f}ms"
+    )
+    print(
+        f"dispatched={summary['dispatched']} failed={summary['failed']} "
+        f"unknown={summary['unknown']} "
+        f"in {elapsed:.2f}s -> {summary['dispatched'] / elapsed * 60:,.0f} calls/min"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+            float(sys.argv[2]) if len(sys.argv) > 2 else 200,
+        )
+    )
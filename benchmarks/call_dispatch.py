@@ -0,0 +1,146 @@
+"""
+Benchmark: /call/send throughput against a local fake Twilio API
+
+Starts a fake Twilio REST API (in its own thread and event loop) that takes
+TWILIO_LATENCY seconds to create a call, points the app's Twilio client at
+it and sends N /call/send requests at several concurrency levels, then
+waits for the call queue workers to place every call. Each level runs
+twice: with the async Twilio client, and with a blocking client, as calls
+used to be created. /call/send only enqueues, so it accepts calls quickly
+either way; calls are placed at up to CALL_QUEUE_WORKERS / TWILIO_LATENCY
+per second with the async client but only 1 / TWILIO_LATENCY when blocking.
+
+Usage: python -m benchmarks.call_dispatch [calls] [latency_ms]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+import statistics
+
+os.environ["TTS_PROVIDER"] = "fake"
+os.environ.setdefault("FAKE_TTS_SEED", "42")
+os.environ.setdefault("TWILIO_ACCOUNT_SID", "ACbenchmark")
+os.environ.setdefault("TWILIO_AUTH_TOKEN", "benchmark")
+os.environ.setdefault("TWILIO_PHONE_NUMBER", "+10000000000")
+# Measure the client itself, not CPS pacing (see benchmarks/call_pacing.py)
+os.environ.setdefault("TWILIO_CPS", "0")
+
+import httpx  # noqa: E402
+from aiohttp import web  # noqa: E402
+from twilio.rest import Client  # noqa: E402
+from main import app  # noqa: E402
+from config import twilio_client  # noqa: E402
+from routes import voice_routes  # noqa: E402
+from utils import metrics, twilio_calls  # noqa: E402
+
+CONCURRENCY_LEVELS = [1, 10, 50]
+
+
+def start_fake_twilio(latency: float) -> str:
+    """Serve a minimal Calls.json endpoint in a background thread"""
+    started = threading.Event()
+    address = {}
+
+    async def create_call(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency)
+        form = await request.post()
+        return web.json_response(
+            {
+                "sid": f"CA{time.time_ns():032x}"[:34],
+                "account_sid": request.match_info["account_sid"],
+                "to": form.get("To"),
+                "from": form.get("From"),
+                "status": "queued",
+            },
+            status=201,
+        )
+
+    async def serve():
+        fake = web.Application()
+        fake.router.add_post(
+            "/2010-04-01/Accounts/{account_sid}/Calls.json", create_call
+        )
+        runner = web.AppRunner(fake, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = runner.addresses[0][:2]
+        address["url"] = f"http://{host}:{port}"
+        started.set()
+        await asyncio.Event().wait()
+
+    threading.Thread(target=lambda: asyncio.run(serve()), daemon=True).start()
+    started.wait()
+    return address["url"]
+
+
+async def run(client: httpx.AsyncClient, label: str, calls: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def send(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(
+                "/call/send",
+                json={
+                    "phone_number": f"+1{i:010d}",
+                    "message": f"Dispatch benchmark message {i}.",
+                },
+            )
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    done = metrics.counter("call_queue_completed") + calls
+    start = time.perf_counter()
+    await asyncio.gather(*(send(i) for i in range(calls)))
+    accepted = time.perf_counter() - start
+    while metrics.counter("call_queue_completed") < done:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(
+        f"{label:<9} concurrency={concurrency:<3} "
+        f"accepted {calls / accepted:7.1f}/s "
+        f"(p50={statistics.median(latencies):5.1f}ms p99="
+        f"{latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:5.1f}ms), "
+        f"placed {calls / elapsed:6.1f} calls/s"
+    )
+
+
+async def main(calls: int, latency_ms: float):
+    base_url = start_fake_twilio(latency_ms / 1000)
+    twilio_client.api.base_url = base_url
+    blocking_client = Client(
+        os.environ["TWILIO_ACCOUNT_SID"], os.environ["TWILIO_AUTH_TOKEN"]
+    )
+    blocking_client.api.base_url = base_url
+
+    async def create_call_blocking(
+        url: str, to: str, from_: str, max_wait=None, before_request=None
+    ):
+        if before_request is not None:
+            await before_request()
+        return blocking_client.calls.create(url=url, to=to, from_=from_)
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+        for concurrency in CONCURRENCY_LEVELS:
+            voice_routes.create_call = create_call_blocking
+            await run(client, "blocking", calls, concurrency)
+            voice_routes.create_call = twilio_calls.create_call
+            await run(client, "async", calls, concurrency)
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 100,
+            float(sys.argv[2]) if len(sys.argv) > 2 else 200,
+        )
+    )
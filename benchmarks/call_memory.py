@@ -0,0 +1,85 @@
+"""
+Benchmark: bytes per live call for the call state payload
+
+Compares the old per-call dict ({"sms_body", "from_number", "to_number",
+"message_sid"} in a plain dict keyed by call ID) with CallRecord objects in
+the in-memory call state store, for N calls with unique messages. Memory is
+measured with tracemalloc, so it counts everything allocated per call: the
+key, the payload and the strings in it. The per-call overhead excludes the
+strings every layout has to hold (call ID, message and callee number).
+
+Usage: python -m benchmarks.call_memory [calls]
+"""
+
+import sys
+import uuid
+import asyncio
+import tracemalloc
+
+from utils.call_record import CallRecord
+from utils.call_state import MemoryCallStateStore
+
+MESSAGE = "Hi {i}, your appointment is tomorrow at 3 PM. Press 1 to confirm."
+
+
+def measure(label: str, calls: int, build) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    per_call = (tracemalloc.get_traced_memory()[0] - before) / calls
+    tracemalloc.stop()
+    print(f"{label:<32} {per_call:8.0f} bytes/call")
+    del kept
+    return per_call
+
+
+def build_strings(calls: int):
+    strings = []
+    for i in range(calls):
+        strings += [str(uuid.uuid4()), MESSAGE.format(i=i), f"+1{i:010d}"]
+    return strings
+
+
+def build_dicts(calls: int):
+    store = {}
+    for i in range(calls):
+        call_id = str(uuid.uuid4())
+        store[call_id] = {
+            "sms_body": MESSAGE.format(i=i),
+            "from_number": "+10000000000",
+            "to_number": f"+1{i:010d}",
+            "message_sid": f"api_call_{call_id}",
+        }
+    return store
+
+
+def build_records(calls: int):
+    store = MemoryCallStateStore(max_entries=calls)
+
+    async def fill():
+        for i in range(calls):
+            await store.put(
+                CallRecord(
+                    str(uuid.uuid4()),
+                    MESSAGE.format(i=i),
+                    from_number="+10000000000",
+                    to_number=f"+1{i:010d}",
+                )
+            )
+
+    asyncio.run(fill())
+    return store
+
+
+def main(calls: int):
+    strings = measure("strings only", calls, lambda: build_strings(calls))
+    old = measure("dict payload (before)", calls, lambda: build_dicts(calls))
+    new = measure("CallRecord in memory store", calls, lambda: build_records(calls))
+    print(
+        f"overhead {old - strings:.0f} -> {new - strings:.0f} bytes/call, "
+        f"saved {old - new:.0f} bytes/call ({(old - new) / old:.0%} of the total)"
+    )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,159 @@
+"""
+Benchmark: CPS pacing of outbound calls against a fake Twilio API
+
+Simulates bursts of calls from two caller IDs against a local fake Twilio
+API that enforces an account-wide CPS limit and a lower limit on the first
+number, answering 429 above them, as a real account would queue or reject
+the excess. Runs once without pacing and once with the token-bucket pacer
+configured with the same limits, and reports the peak attempted CPS, the
+calls Twilio rejected, how long calls waited for a slot and how late they
+were released compared to it.
+
+Usage: python -m benchmarks.call_pacing [bursts] [calls_per_burst]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+from collections import defaultdict, deque
+
+os.environ.setdefault("TWILIO_ACCOUNT_SID", "ACbenchmark")
+os.environ.setdefault("TWILIO_AUTH_TOKEN", "benchmark")
+
+from aiohttp import web  # noqa: E402
+from twilio.base.exceptions import TwilioRestException  # noqa: E402
+from config import twilio_client  # noqa: E402
+from utils import metrics, twilio_calls  # noqa: E402
+from utils.call_pacing import CallPacer  # noqa: E402
+
+ACCOUNT_CPS = 10
+NUMBER_A, NUMBER_B = "+15550000001", "+15550000002"
+NUMBER_CPS = {NUMBER_A: 5}
+BURST_INTERVAL = 1.0
+TWILIO_LATENCY = 0.05
+# Clock skew the fake forgives when checking a 1 s window
+WINDOW_TOLERANCE = 0.05
+
+
+class NoPacing:
+    async def wait_for_slot(self, from_number: str, max_wait=None):
+        pass
+
+
+def start_fake_twilio(attempts: dict) -> str:
+    """Serve a Calls.json endpoint that enforces CPS limits with 429s"""
+    started = threading.Event()
+    address = {}
+    accepted = defaultdict(deque)
+    limits = {"account": ACCOUNT_CPS, **NUMBER_CPS}
+
+    async def create_call(request: web.Request) -> web.Response:
+        form = await request.post()
+        now = time.monotonic()
+        keys = ["account", form["From"]]
+        for key in keys:
+            attempts[key].append(now)
+        for key in keys:
+            window = accepted[key]
+            while window and window[0] <= now - (1 - WINDOW_TOLERANCE):
+                window.popleft()
+            if key in limits and len(window) >= limits[key]:
+                return web.json_response(
+                    {"code": 20429, "message": "Too Many Requests", "status": 429},
+                    status=429,
+                )
+        for key in keys:
+            accepted[key].append(now)
+        await asyncio.sleep(TWILIO_LATENCY)
+        return web.json_response({"sid": f"CA{time.time_ns():032x}"}, status=201)
+
+    async def serve():
+        fake = web.Application()
+        fake.router.add_post(
+            "/2010-04-01/Accounts/{account_sid}/Calls.json", create_call
+        )
+        runner = web.AppRunner(fake, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = runner.addresses[0][:2]
+        address["url"] = f"http://{host}:{port}"
+        started.set()
+        await asyncio.Event().wait()
+
+    threading.Thread(target=lambda: asyncio.run(serve()), daemon=True).start()
+    started.wait()
+    return address["url"]
+
+
+def peak_cps(times: list) -> int:
+    """Most attempts within any 1 s window, as the fake Twilio counts them"""
+    times = sorted(times)
+    peak, start = 0, 0
+    for end in range(len(times)):
+        while times[end] - times[start] >= 1 - WINDOW_TOLERANCE:
+            start += 1
+        peak = max(peak, end - start + 1)
+    return peak
+
+
+async def run(label: str, pacer, bursts: int, calls_per_burst: int):
+    attempts = defaultdict(list)
+    twilio_client.api.base_url = start_fake_twilio(attempts)
+    twilio_calls.call_pacer = pacer
+    rejected = 0
+
+    async def call(i: int):
+        nonlocal rejected
+        try:
+            await twilio_calls.create_call(
+                url="http://bench/webhook",
+                to=f"+1{i:010d}",
+                from_=NUMBER_A if i % 2 else NUMBER_B,
+            )
+        except TwilioRestException:
+            rejected += 1
+
+    start = time.perf_counter()
+    calls = []
+    for burst in range(bursts):
+        calls += [
+            asyncio.create_task(call(burst * calls_per_burst + i))
+            for i in range(calls_per_burst)
+        ]
+        await asyncio.sleep(BURST_INTERVAL)
+    await asyncio.gather(*calls)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{label:<9} calls={len(calls)} rejected={rejected} in {elapsed:.1f}s | "
+        f"peak CPS: account={peak_cps(attempts['account'])}/{ACCOUNT_CPS} "
+        f"A={peak_cps(attempts[NUMBER_A])}/{NUMBER_CPS[NUMBER_A]} "
+        f"B={peak_cps(attempts[NUMBER_B])}"
+    )
+
+
+async def main(bursts: int, calls_per_burst: int):
+    await twilio_calls.start_client()
+    await run("unpaced", NoPacing(), bursts, calls_per_burst)
+    await run("paced", CallPacer(ACCOUNT_CPS, NUMBER_CPS), bursts, calls_per_burst)
+    await twilio_calls.close_client()
+
+    summaries = metrics.snapshot()["summaries"]
+    for name in ("twilio_cps_wait_ms", "twilio_cps_lag_ms"):
+        summary = summaries[name]
+        print(
+            f"{name:<20} p50={summary['p50']:8.1f}ms p99={summary['p99']:8.1f}ms "
+            f"max={summary['max']:8.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 3,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 20,
+        )
+    )
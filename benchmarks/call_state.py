@@ -0,0 +1,84 @@
+"""
+Benchmark: p50/p99 latency of call state operations per backend
+
+Runs put, get and delete for N calls against each call state backend: the
+in-memory store, SQLite (WAL) in a temporary directory and, when the redis
+package is installed and a server answers at CALL_STATE_REDIS_URL, Redis.
+Operations run CONCURRENCY at a time, as webhooks would.
+
+Usage: python -m benchmarks.call_state [calls] [concurrency]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import statistics
+
+from utils.call_record import CallRecord
+from utils.call_state import (
+    CallStateStore,
+    MemoryCallStateStore,
+    SQLiteCallStateStore,
+    RedisCallStateStore,
+)
+
+
+def summarize(label: str, latencies: list):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{label:<16} n={len(latencies):<6} p50={statistics.median(latencies) * 1000:8.1f}us "
+        f"p99={p99 * 1000:8.1f}us"
+    )
+
+
+async def run(store: CallStateStore, calls: int, concurrency: int):
+    await store.start()
+    semaphore = asyncio.Semaphore(concurrency)
+    message = "Hi Ann, your appointment is tomorrow at 3 PM. Press 1 to confirm."
+
+    async def timed(latencies: list, op):
+        async with semaphore:
+            start = time.perf_counter()
+            await op
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    for name, make_op in [
+        (
+            "put",
+            lambda i: store.put(
+                CallRecord(f"bench-{i}", message, "+10000000000", "+10000000001")
+            ),
+        ),
+        ("get", lambda i: store.get(f"bench-{i}")),
+        ("delete", lambda i: store.delete(f"bench-{i}")),
+    ]:
+        latencies = []
+        await asyncio.gather(*(timed(latencies, make_op(i)) for i in range(calls)))
+        summarize(f"{store.name} {name}", latencies)
+    await store.close()
+
+
+async def main(calls: int, concurrency: int):
+    await run(MemoryCallStateStore(), calls, concurrency)
+    with tempfile.TemporaryDirectory() as directory:
+        await run(
+            SQLiteCallStateStore(path=os.path.join(directory, "call_state.db")),
+            calls,
+            concurrency,
+        )
+    try:
+        await run(RedisCallStateStore(), calls, concurrency)
+    except Exception as e:
+        print(f"redis skipped: {str(e)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 10000,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 50,
+        )
+    )
@@ -0,0 +1,70 @@
+"""
+Benchmark: peak RSS while many syntheses stream to disk concurrently
+
+Runs N concurrent syntheses of a long message against the offline fake TTS
+provider and samples the process RSS while they run. With streaming, the
+growth per synthesis should stay near TTS_STREAM_CHUNK_BYTES rather than the
+size of the audio file.
+
+Usage: python -m benchmarks.stream_memory [concurrent_syntheses]
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+CONCURRENCY = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+os.environ["TTS_PROVIDER"] = "fake"
+os.environ.setdefault("FAKE_TTS_LATENCY_MS", "100")
+os.environ["TTS_MAX_CONCURRENCY"] = str(CONCURRENCY)
+
+from config import AUDIO_DIR  # noqa: E402
+from utils import elevenlabs  # noqa: E402
+
+# About two minutes of audio per synthesis
+MESSAGE = "This is a long benchmark message that keeps on going. " * 33
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+async def sample_peak(stop: asyncio.Event) -> int:
+    peak = 0
+    while not stop.is_set():
+        peak = max(peak, rss_bytes())
+        await asyncio.sleep(0.005)
+    return peak
+
+
+async def main():
+    await elevenlabs.start_client()
+    baseline = rss_bytes()
+
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_peak(stop))
+    start = time.perf_counter()
+    filenames = await asyncio.gather(
+        *(
+            elevenlabs.synthesize_audio(f"{MESSAGE} ({i} {time.time_ns()})")
+            for i in range(CONCURRENCY)
+        )
+    )
+    elapsed = time.perf_counter() - start
+    stop.set()
+    peak = await sampler
+    await elevenlabs.close_client()
+
+    written = sum(os.path.getsize(os.path.join(AUDIO_DIR, f)) for f in filenames if f)
+    mb = 1024 * 1024
+    print(f"syntheses={CONCURRENCY} completed={sum(1 for f in filenames if f)}")
+    print(f"elapsed={elapsed:.2f}s written={written / mb:.1f}MB")
+    print(f"rss baseline={baseline / mb:.1f}MB peak={peak / mb:.1f}MB")
+    print(f"rss growth per synthesis={(peak - baseline) / CONCURRENCY / 1024:.1f}KB")
+    print(f"audio per synthesis={written / CONCURRENCY / 1024:.1f}KB")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
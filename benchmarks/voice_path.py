@@ -0,0 +1,90 @@
+"""
+Benchmark: throughput and tail latency of the voice webhook, fully offline
+
+Uses the fake TTS provider (TTS_PROVIDER=fake) so no paid API is called.
+Tune the simulated upstream with FAKE_TTS_LATENCY_MS, FAKE_TTS_LATENCY_SIGMA
+and FAKE_TTS_ERROR_RATE. Every call speaks a unique message, so each
+webhook needs a fresh synthesis. With --template each call's message is
+rendered from a shared template instead, so only the personalized segments
+are new. Either way no webhook may answer with the error TwiML.
+
+Usage: python -m benchmarks.voice_path [calls] [concurrency] [--template]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import statistics
+
+TEMPLATE = "--template" in sys.argv
+os.environ["TTS_PROVIDER"] = "fake"
+os.environ.setdefault("FAKE_TTS_SEED", "42")
+
+import httpx  # noqa: E402
+from main import app  # noqa: E402
+from utils.call_record import CallRecord  # noqa: E402
+from utils.call_state import call_state_store  # noqa: E402
+from utils.message_templates import render_template  # noqa: E402
+from utils import elevenlabs  # noqa: E402
+
+
+async def main(calls: int, concurrency: int):
+    await elevenlabs.start_client()
+    for i in range(calls):
+        message = f"Voice path benchmark message {i} ({time.time_ns()})."
+        segments = None
+        if TEMPLATE:
+            message, segments = render_template(
+                "Hi {name}, this is voice path benchmark call {number}.",
+                {"name": f"caller {i}", "number": str(time.time_ns())},
+            )
+        await call_state_store.put(
+            CallRecord(
+                f"bench-{i}",
+                message,
+                from_number="+10000000000",
+                to_number="+10000000001",
+                source="bench",
+                segments=segments,
+            )
+        )
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    played = 0
+
+    async def one(client: httpx.AsyncClient, i: int):
+        nonlocal played
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(f"/webhook/voice/call/bench-{i}")
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert "there was an error" not in response.text, response.text
+            played += "<Play>" in response.text.split("<Gather")[0]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(client, i) for i in range(calls)))
+        elapsed = time.perf_counter() - start
+    await elevenlabs.close_client()
+
+    latencies.sort()
+    print(f"calls={calls} concurrency={concurrency} elapsed={elapsed:.2f}s")
+    print(f"throughput={calls / elapsed:.1f} webhooks/s")
+    print(
+        f"latency p50={statistics.median(latencies):.1f}ms "
+        f"p99={latencies[int(len(latencies) * 0.99) - 1]:.1f}ms "
+        f"max={latencies[-1]:.1f}ms"
+    )
+    print(f"ElevenLabs audio played={played} Polly fallback={calls - played}")
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if a != "--template"]
+    calls = int(args[0]) if args else 200
+    concurrency = int(args[1]) if len(args) > 1 else 50
+    asyncio.run(main(calls, concurrency))
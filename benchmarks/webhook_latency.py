@@ -0,0 +1,86 @@
+"""
+Benchmark: webhook latency while ElevenLabs syntheses are in flight
+
+Runs the app in-process against a simulated ElevenLabs upstream that takes
+UPSTREAM_LATENCY seconds per synthesis, then probes the health endpoint
+while N voice webhooks are synthesizing. With a non-blocking TTS client the
+probe latency should stay flat regardless of N.
+
+Usage: python -m benchmarks.webhook_latency [concurrent_syntheses]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import statistics
+
+os.environ.setdefault("ELEVENLABS_API_KEY", "benchmark")
+
+import httpx  # noqa: E402
+from main import app  # noqa: E402
+from utils.call_record import CallRecord  # noqa: E402
+from utils.call_state import call_state_store  # noqa: E402
+from utils import elevenlabs  # noqa: E402
+
+UPSTREAM_LATENCY = 1.5
+PROBE_INTERVAL = 0.05
+
+
+async def fake_elevenlabs(request: httpx.Request) -> httpx.Response:
+    await asyncio.sleep(UPSTREAM_LATENCY)
+    return httpx.Response(200, content=b"\xff\xfb" * 4096)
+
+
+async def probe(client: httpx.AsyncClient, duration: float) -> list:
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        await client.get("/")
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(PROBE_INTERVAL)
+    return latencies
+
+
+def summarize(label: str, latencies: list):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{label:<28} n={len(latencies):<4} p50={statistics.median(latencies):7.2f}ms "
+        f"p99={p99:7.2f}ms max={latencies[-1]:7.2f}ms"
+    )
+
+
+async def main(concurrency: int):
+    await elevenlabs.start_client(transport=httpx.MockTransport(fake_elevenlabs))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        summarize("idle", await probe(client, 1.0))
+
+        webhooks = []
+        for i in range(concurrency):
+            call_id = f"bench-{i}"
+            await call_state_store.put(
+                CallRecord(
+                    call_id,
+                    f"Benchmark message number {i}",
+                    from_number="+10000000000",
+                    to_number="+10000000001",
+                    source="bench",
+                )
+            )
+            webhooks.append(client.post(f"/webhook/voice/call/{call_id}"))
+
+        start = time.perf_counter()
+        results = await asyncio.gather(probe(client, UPSTREAM_LATENCY), *webhooks)
+        elapsed = time.perf_counter() - start
+        summarize(f"{concurrency} syntheses in flight", results[0])
+        print(f"{concurrency} voice webhooks completed in {elapsed:.2f}s")
+    await elevenlabs.close_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50))
@@ -2,6 +2,7 @@ import os
 import logging
 from dotenv import load_dotenv
 from twilio.rest import Client
+from twilio.http.async_http_client import AsyncTwilioHttpClient
 from typing import Optional
 
 # Load environment variables from .env file
@@ -16,20 +17,189 @@ TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 TWILIO_PHONE_NUMBER = os.getenv("TWILIO_PHONE_NUMBER")
 
+# Twilio REST API used to create calls: base URL (point it at a local fake
+# for load tests), per-request timeout and size of the shared connection pool
+TWILIO_API_BASE_URL = os.getenv("TWILIO_API_BASE_URL", "https://api.twilio.com")
+TWILIO_TIMEOUT = float(os.getenv("TWILIO_TIMEOUT", "10"))
+TWILIO_MAX_CONNECTIONS = int(os.getenv("TWILIO_MAX_CONNECTIONS", "100"))
+
+# Outbound calls per second (CPS) Twilio allows: TWILIO_CPS for the whole
+# account (0, the default, disables pacing; Twilio accounts start at 1) and
+# optional per-number limits as "+15551234567=5,+15557654321=2". Calls are
+# paced to stay under both, in this process; with several workers or replicas
+# split the limits between them. TWILIO_CPS_BURST calls may go out back to
+# back after a pause
+TWILIO_CPS = float(os.getenv("TWILIO_CPS", "0"))
+TWILIO_CPS_BURST = int(os.getenv("TWILIO_CPS_BURST", "1"))
+TWILIO_NUMBER_CPS = {}
+for entry in os.getenv("TWILIO_NUMBER_CPS", "").split(","):
+    if entry.strip():
+        number, _, cps = entry.partition("=")
+        try:
+            TWILIO_NUMBER_CPS[number.strip()] = float(cps)
+        except ValueError:
+            logger.warning(f"Ignoring malformed TWILIO_NUMBER_CPS entry '{entry}'")
+
+# POST /call/batch: most recipients per batch
+CALL_BATCH_MAX_RECIPIENTS = int(os.getenv("CALL_BATCH_MAX_RECIPIENTS", "10000"))
+
 # ElevenLabs configuration
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
-ELEVENLABS_VOICE_ID = os.getenv(
-    "ELEVENLABS_VOICE_ID", "21m00Tcm4TlvDq8ikWAM"
-)  # Default to Rachel voice
+ELEVENLABS_VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID", "N2lVS1w4EtoT3dr4eOWO")
+ELEVENLABS_MODEL_ID = os.getenv("ELEVENLABS_MODEL_ID", "eleven_monolingual_v1")
+
+# Size of the chunks streamed from the TTS provider to disk
+TTS_STREAM_CHUNK_BYTES = int(os.getenv("TTS_STREAM_CHUNK_BYTES", "16384"))
+
+# TTS backend: "elevenlabs", or "fake" for offline load tests and benchmarks
+TTS_PROVIDER = os.getenv("TTS_PROVIDER", "elevenlabs")
+
+# Fake TTS provider behaviour: median latency, log-normal spread, error rate
+FAKE_TTS_LATENCY_MS = float(os.getenv("FAKE_TTS_LATENCY_MS", "300"))
+FAKE_TTS_LATENCY_SIGMA = float(os.getenv("FAKE_TTS_LATENCY_SIGMA", "0.5"))
+FAKE_TTS_ERROR_RATE = float(os.getenv("FAKE_TTS_ERROR_RATE", "0"))
+FAKE_TTS_SEED = (
+    int(os.environ["FAKE_TTS_SEED"]) if "FAKE_TTS_SEED" in os.environ else None
+)
+
+# ElevenLabs output format, e.g. mp3_44100_128 (default), mp3_22050_32 or
+# ulaw_8000 (8 kHz mu-law WAV, Twilio's native telephony format)
+ELEVENLABS_OUTPUT_FORMAT = os.getenv("ELEVENLABS_OUTPUT_FORMAT", "mp3_44100_128")
+
+# ElevenLabs HTTP client configuration (shared, app-scoped connection pool)
+ELEVENLABS_HTTP2 = os.getenv("ELEVENLABS_HTTP2", "true").lower() == "true"
+ELEVENLABS_MAX_CONNECTIONS = int(os.getenv("ELEVENLABS_MAX_CONNECTIONS", "20"))
+ELEVENLABS_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.getenv("ELEVENLABS_MAX_KEEPALIVE_CONNECTIONS", "10")
+)
+ELEVENLABS_KEEPALIVE_EXPIRY = float(os.getenv("ELEVENLABS_KEEPALIVE_EXPIRY", "60"))
+ELEVENLABS_TIMEOUT = float(os.getenv("ELEVENLABS_TIMEOUT", "30"))
+
+# Bounded concurrency towards ElevenLabs; above TTS_MAX_QUEUE_DEPTH waiting
+# requests, pre-synthesis and warmup work is rejected (live calls never are)
+TTS_MAX_CONCURRENCY = int(os.getenv("TTS_MAX_CONCURRENCY", "5"))
+TTS_MAX_QUEUE_DEPTH = int(os.getenv("TTS_MAX_QUEUE_DEPTH", "100"))
+
+# ElevenLabs circuit breaker: open when TTS_BREAKER_FAILURE_RATE of the last
+# TTS_BREAKER_WINDOW requests failed or took over TTS_BREAKER_SLOW_MS to return
+# their first audio, then probe again after TTS_BREAKER_OPEN_SECONDS
+TTS_BREAKER_WINDOW = int(os.getenv("TTS_BREAKER_WINDOW", "20"))
+TTS_BREAKER_MIN_REQUESTS = int(os.getenv("TTS_BREAKER_MIN_REQUESTS", "5"))
+TTS_BREAKER_FAILURE_RATE = float(os.getenv("TTS_BREAKER_FAILURE_RATE", "0.5"))
+TTS_BREAKER_SLOW_MS = float(os.getenv("TTS_BREAKER_SLOW_MS", "5000"))
+TTS_BREAKER_OPEN_SECONDS = float(os.getenv("TTS_BREAKER_OPEN_SECONDS", "30"))
+
+# Concurrent syntheses per /tts/warm job
+TTS_WARM_CONCURRENCY = int(os.getenv("TTS_WARM_CONCURRENCY", "3"))
+
+# Latency budget for synthesis in the voice webhook before falling back to Polly
+TTS_DEADLINE_MS = int(os.getenv("TTS_DEADLINE_MS", "800"))
+
+# Split long messages at sentence boundaries and synthesize chunks concurrently
+TTS_CHUNKING = os.getenv("TTS_CHUNKING", "false").lower() == "true"
+TTS_CHUNK_MIN_CHARS = int(os.getenv("TTS_CHUNK_MIN_CHARS", "200"))
+TTS_CHUNK_CONCURRENCY = int(os.getenv("TTS_CHUNK_CONCURRENCY", "4"))
+# Playback starts on the first chunk; /audio waits this long for a later one
+TTS_CHUNK_WAIT_SECONDS = float(os.getenv("TTS_CHUNK_WAIT_SECONDS", "10"))
+
+# Optional JSON file overriding the static IVR prompt texts ({"name": "text"})
+IVR_PROMPTS_FILE = os.getenv("IVR_PROMPTS_FILE")
+
+# Prompts that fail to render at startup (e.g. during a TTS outage) are
+# retried after IVR_PROMPT_RETRY_SECONDS, doubling up to the max, until all
+# of them are cached
+IVR_PROMPT_RETRY_SECONDS = float(os.getenv("IVR_PROMPT_RETRY_SECONDS", "10"))
+IVR_PROMPT_RETRY_MAX_SECONDS = float(os.getenv("IVR_PROMPT_RETRY_MAX_SECONDS", "300"))
 
 # Audio directory configuration
-AUDIO_DIR = "audio_files"
+AUDIO_DIR = os.getenv("AUDIO_DIR", "audio_files")
 os.makedirs(AUDIO_DIR, exist_ok=True)
 
-# Initialize Twilio client if credentials are provided
+# TTS audio cache configuration
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(500 * 1024 * 1024)))
+TTS_CACHE_INDEX_PATH = os.getenv(
+    "TTS_CACHE_INDEX_PATH", os.path.join(AUDIO_DIR, ".tts_cache_index.json")
+)
+# Each worker publishes the audio its active calls reference this often, so
+# workers sharing AUDIO_DIR never evict or sweep each other's call audio
+ACTIVE_AUDIO_PUBLISH_SECONDS = float(os.getenv("ACTIVE_AUDIO_PUBLISH_SECONDS", "5"))
+
+# Audio janitor: delete files unused for AUDIO_TTL_SECONDS and keep AUDIO_DIR
+# under AUDIO_DIR_QUOTA_BYTES, sweeping every JANITOR_INTERVAL_SECONDS
+AUDIO_TTL_SECONDS = int(os.getenv("AUDIO_TTL_SECONDS", str(7 * 24 * 3600)))
+AUDIO_DIR_QUOTA_BYTES = int(os.getenv("AUDIO_DIR_QUOTA_BYTES", str(1024 * 1024 * 1024)))
+JANITOR_INTERVAL_SECONDS = int(os.getenv("JANITOR_INTERVAL_SECONDS", "300"))
+
+# Coordinate identical syntheses across uvicorn workers with lock files
+TTS_CROSS_WORKER_LOCK = os.getenv("TTS_CROSS_WORKER_LOCK", "false").lower() == "true"
+
+# Where call data waits for the call's webhooks: "memory" (bounded, this
+# process only), "sqlite" (survives restarts, one node) or "redis" (shared
+# by all workers and replicas; needs the redis package)
+CALL_STATE_BACKEND = os.getenv("CALL_STATE_BACKEND", "memory")
+CALL_STATE_TTL_SECONDS = int(os.getenv("CALL_STATE_TTL_SECONDS", "7200"))
+CALL_STATE_MAX_ENTRIES = int(os.getenv("CALL_STATE_MAX_ENTRIES", "100000"))
+CALL_STATE_SWEEP_INTERVAL_SECONDS = int(
+    os.getenv("CALL_STATE_SWEEP_INTERVAL_SECONDS", "60")
+)
+CALL_STATE_SQLITE_PATH = os.getenv("CALL_STATE_SQLITE_PATH", "call_state.db")
+CALL_STATE_REDIS_URL = os.getenv("CALL_STATE_REDIS_URL", "redis://localhost:6379/0")
+
+# Durable queue of /call/send jobs: "sqlite" (one node) or "redis" (shared by
+# every replica; needs the redis package). CALL_QUEUE_WORKERS workers per
+# process place the calls, retrying transient Twilio errors with exponential
+# backoff and jitter up to CALL_QUEUE_MAX_ATTEMPTS times. Workers renew their
+# lease on a job while they place its call; a job whose worker died is picked
+# up again once its lease of CALL_QUEUE_LEASE_SECONDS runs out
+CALL_QUEUE_BACKEND = os.getenv("CALL_QUEUE_BACKEND", "sqlite")
+CALL_QUEUE_SQLITE_PATH = os.getenv("CALL_QUEUE_SQLITE_PATH", "call_queue.db")
+CALL_QUEUE_REDIS_URL = os.getenv("CALL_QUEUE_REDIS_URL", CALL_STATE_REDIS_URL)
+CALL_QUEUE_WORKERS = int(os.getenv("CALL_QUEUE_WORKERS", "10"))
+CALL_QUEUE_MAX_ATTEMPTS = int(os.getenv("CALL_QUEUE_MAX_ATTEMPTS", "5"))
+CALL_QUEUE_RETRY_BASE_SECONDS = float(os.getenv("CALL_QUEUE_RETRY_BASE_SECONDS", "1"))
+CALL_QUEUE_RETRY_MAX_SECONDS = float(os.getenv("CALL_QUEUE_RETRY_MAX_SECONDS", "60"))
+CALL_QUEUE_LEASE_SECONDS = float(os.getenv("CALL_QUEUE_LEASE_SECONDS", "60"))
+CALL_QUEUE_POLL_SECONDS = float(os.getenv("CALL_QUEUE_POLL_SECONDS", "1"))
+# Finished jobs stay queryable at GET /call/jobs/{job_id} for this long
+CALL_QUEUE_RETENTION_SECONDS = int(os.getenv("CALL_QUEUE_RETENTION_SECONDS", "86400"))
+
+# How voice webhooks find a call's data: "store" keeps it in this process and
+# puts the call ID in the webhook URL; "token" packs it into an HMAC-signed
+# (optionally compressed) token in the URL so any replica can handle the call
+CALL_ROUTING_MODE = os.getenv("CALL_ROUTING_MODE", "store")
+CALL_TOKEN_SECRET = os.getenv("CALL_TOKEN_SECRET", "")
+CALL_TOKEN_TTL_SECONDS = int(os.getenv("CALL_TOKEN_TTL_SECONDS", "3600"))
+CALL_TOKEN_COMPRESS = os.getenv("CALL_TOKEN_COMPRESS", "true").lower() == "true"
+if CALL_ROUTING_MODE == "token" and not CALL_TOKEN_SECRET:
+    logger.warning(
+        "CALL_ROUTING_MODE=token needs CALL_TOKEN_SECRET; keeping call data in-process"
+    )
+    CALL_ROUTING_MODE = "store"
+
+# Shared audio store so every replica can serve audio any replica generated:
+# "local" (AUDIO_DIR only) or "s3" (any S3-compatible service, e.g. MinIO)
+AUDIO_STORE = os.getenv("AUDIO_STORE", "local")
+AUDIO_STORE_S3_ENDPOINT = os.getenv(
+    "AUDIO_STORE_S3_ENDPOINT", "https://s3.amazonaws.com"
+)
+AUDIO_STORE_S3_BUCKET = os.getenv("AUDIO_STORE_S3_BUCKET", "")
+AUDIO_STORE_S3_PREFIX = os.getenv("AUDIO_STORE_S3_PREFIX", "audio/")
+AUDIO_STORE_S3_REGION = os.getenv("AUDIO_STORE_S3_REGION", "us-east-1")
+AUDIO_STORE_S3_ACCESS_KEY = os.getenv("AUDIO_STORE_S3_ACCESS_KEY", "")
+AUDIO_STORE_S3_SECRET_KEY = os.getenv("AUDIO_STORE_S3_SECRET_KEY", "")
+AUDIO_STORE_TIMEOUT = float(os.getenv("AUDIO_STORE_TIMEOUT", "5"))
+
+# Initialize Twilio client if credentials are provided. Requests go through
+# an async (aiohttp) HTTP client so creating a call never blocks the event
+# loop; its pooled session is opened on startup (see utils/twilio_calls.py)
 twilio_client: Optional[Client] = None
 if TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN:
-    twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+    twilio_client = Client(
+        TWILIO_ACCOUNT_SID,
+        TWILIO_AUTH_TOKEN,
+        http_client=AsyncTwilioHttpClient(pool_connections=False),
+    )
+    twilio_client.api.base_url = TWILIO_API_BASE_URL
     logger.info("Twilio client initialized successfully")
 else:
     logger.warning(
@@ -1,27 +1,82 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
 import logging
-from config import AUDIO_DIR
-from routes import sms_routes, voice_routes
+from routes import sms_routes, voice_routes, batch_routes, tts_routes, audio_routes
+from utils import elevenlabs, metrics, twilio_calls
+from utils.audio_cache import audio_cache, run_active_files_publisher
+from utils.prompts import warmup_prompts
+from utils.janitor import run_janitor
+from utils.circuit_breaker import elevenlabs_breaker
+from utils.call_state import call_state_store, run_call_state_sweeper
+from utils.call_queue import call_queue, run_call_queue
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Twilio SMS Webhook Server", version="1.0.0")
 
-# Mount static files for serving audio
-app.mount("/audio", StaticFiles(directory=AUDIO_DIR), name="audio")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared clients on startup and close them on shutdown"""
+    await elevenlabs.start_client()
+    await twilio_calls.start_client()
+    await call_state_store.start()
+    await call_queue.start()
+    # Never evict audio a dispatched or ringing call is about to play
+    audio_cache.protected_files = sms_routes.get_active_audio_files
+    # Render the static IVR prompts in the background; calls use Polly until ready
+    warmup_task = asyncio.create_task(warmup_prompts())
+    # Let other workers sharing AUDIO_DIR see which audio our calls still use
+    publisher_task = asyncio.create_task(run_active_files_publisher())
+    janitor_task = asyncio.create_task(run_janitor(audio_cache.shared_protected_files))
+    sweeper_task = asyncio.create_task(
+        run_call_state_sweeper(sms_routes.prune_audio_tasks)
+    )
+    queue_task = asyncio.create_task(run_call_queue(voice_routes.run_call_job))
+    yield
+    queue_task.cancel()
+    # Let the workers stop before the queue's connection is closed
+    await asyncio.gather(queue_task, return_exceptions=True)
+    background_tasks = (sweeper_task, janitor_task, publisher_task, warmup_task)
+    for task in background_tasks:
+        task.cancel()
+    # And the rest before the clients and stores they use are closed
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await elevenlabs.close_client()
+    await twilio_calls.close_client()
+    await call_state_store.close()
+    await call_queue.close()
+    await audio_cache.save()
+
+
+app = FastAPI(title="Twilio SMS Webhook Server", version="1.0.0", lifespan=lifespan)
 
 # Include route modules
 app.include_router(sms_routes.router, tags=["SMS"])
 app.include_router(voice_routes.router, tags=["Voice"])
+app.include_router(batch_routes.router, tags=["Voice"])
+app.include_router(tts_routes.router, tags=["TTS"])
+app.include_router(audio_routes.router, tags=["Audio"])
 
 
 @app.get("/")
 async def root():
     """Health check endpoint"""
-    return {"message": "Twilio SMS Webhook Server is running!"}
+    return {
+        "message": "Twilio SMS Webhook Server is running!",
+        "tts_circuit": elevenlabs_breaker.stats(),
+    }
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Export in-process metrics (counters, gauges and latency summaries)"""
+    return {
+        **metrics.snapshot(),
+        "tts_cache": audio_cache.stats(),
+        "tts_circuit": elevenlabs_breaker.stats(),
+    }
 
 
 if __name__ == "__main__":
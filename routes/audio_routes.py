@@ -0,0 +1,215 @@
+import os
+import re
+import asyncio
+import logging
+from typing import Optional, Tuple
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+from starlette.types import Receive, Scope, Send
+from config import AUDIO_DIR
+from utils import metrics
+from utils.audio_cache import audio_cache
+from utils.audio_formats import AUDIO_FORMATS
+from utils.elevenlabs import audio_filename, restore_from_store, wait_for_audio
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Audio files are named after the cache key of the text, voice, model, settings
+# and output format that produced them, so a URL always maps to the same bytes
+AUDIO_FILENAME = re.compile(r"^([0-9a-f]{64})\.([a-z0-9]+)$")
+CONTENT_TYPES = {fmt.extension: fmt.content_type for fmt in AUDIO_FORMATS.values()}
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+READ_CHUNK_BYTES = 64 * 1024
+
+
+class AudioFileResponse(Response):
+    """
+    Send a byte range of a file without loading it into memory
+
+    Uses the ASGI zero-copy send extension (sendfile) when the server offers
+    it, otherwise reads the file in chunks off the event loop.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        start: int,
+        length: int,
+        status_code: int,
+        headers: dict,
+        send_body: bool = True,
+    ):
+        super().__init__(status_code=status_code, headers=headers)
+        self.path = path
+        self.start = start
+        self.length = length
+        self.send_body = send_body
+        self.headers["content-length"] = str(length)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        start_message = {
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        }
+        if not self.send_body or self.length == 0:
+            await send(start_message)
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        # Open before sending headers; once open, the janitor deleting the
+        # file doesn't affect the transfer
+        f = await asyncio.to_thread(open, self.path, "rb")
+        try:
+            await send(start_message)
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send(
+                    {
+                        "type": "http.response.zerocopysend",
+                        "file": f.fileno(),
+                        "offset": self.start,
+                        "count": self.length,
+                    }
+                )
+                return
+
+            await asyncio.to_thread(f.seek, self.start)
+            remaining = self.length
+            while remaining > 0:
+                chunk = await asyncio.to_thread(
+                    f.read, min(READ_CHUNK_BYTES, remaining)
+                )
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": remaining > 0,
+                    }
+                )
+            if remaining > 0:
+                # File shrank underneath us; end the body rather than hang
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            await asyncio.to_thread(f.close)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Check an If-None-Match / If-Range header against our ETag"""
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    # Weak comparison is fine for If-None-Match on immutable files
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single "bytes=start-end" range into an inclusive (start, end) pair
+
+    Returns None when the header should be ignored (multiple ranges or a
+    different unit) and raises ValueError when the range can't be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                raise ValueError("Empty suffix range")
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        raise ValueError(f"Malformed range '{header}'")
+
+    if start >= size or end < start:
+        raise ValueError(f"Range '{header}' not satisfiable for {size} bytes")
+    return start, min(end, size - 1)
+
+
+@router.api_route("/audio/{filename}", methods=["GET", "HEAD"])
+async def serve_audio(filename: str, request: Request):
+    """
+    Serve synthesized audio with long-lived caching headers
+
+    Audio URLs are content-addressed and never change, so responses carry an
+    immutable Cache-Control and a strong ETag. Conditional requests get a 304
+    and single byte ranges a 206, letting Twilio's media cache and any CDN
+    in front of us revalidate or resume cheaply.
+    """
+    match = AUDIO_FILENAME.match(filename)
+    if not match or match.group(2) not in CONTENT_TYPES:
+        raise HTTPException(status_code=404, detail="Audio file not found")
+
+    key = match.group(1)
+    path = os.path.join(AUDIO_DIR, filename)
+    try:
+        stat = await asyncio.to_thread(os.stat, path)
+    except FileNotFoundError:
+        # A message chunk still being synthesized (playback starts with the
+        # first chunk), generated on another replica, or swept locally by
+        # the janitor
+        if filename != audio_filename(key) or not (
+            await wait_for_audio(key) or await restore_from_store(key)
+        ):
+            metrics.increment("audio_serve_not_found")
+            raise HTTPException(status_code=404, detail="Audio file not found")
+        stat = await asyncio.to_thread(os.stat, path)
+
+    digest = audio_cache.digest(key)
+    if digest:
+        etag = f'"{digest[:32]}"'
+    else:
+        # Files written before digests were recorded
+        etag = f'"{key[:16]}-{stat.st_size:x}-{int(stat.st_mtime):x}"'
+
+    headers = {
+        "etag": etag,
+        "cache-control": IMMUTABLE_CACHE_CONTROL,
+        "accept-ranges": "bytes",
+        "content-type": CONTENT_TYPES[match.group(2)],
+    }
+    send_body = request.method != "HEAD"
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        metrics.increment("audio_serve_not_modified")
+        return Response(status_code=304, headers=headers)
+
+    size = stat.st_size
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError as e:
+            logger.info(f"Rejecting range request for {filename}: {str(e)}")
+            return Response(
+                status_code=416,
+                headers={**headers, "content-range": f"bytes */{size}"},
+            )
+        if byte_range is not None:
+            start, end = byte_range
+            metrics.increment("audio_serve_partial")
+            return AudioFileResponse(
+                path,
+                start,
+                end - start + 1,
+                status_code=206,
+                headers={**headers, "content-range": f"bytes {start}-{end}/{size}"},
+                send_body=send_body,
+            )
+
+    metrics.increment("audio_serve_full")
+    return AudioFileResponse(
+        path, 0, size, status_code=200, headers=headers, send_body=send_body
+    )
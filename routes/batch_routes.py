@@ -0,0 +1,317 @@
+import json
+import time
+import uuid
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from config import (
+    twilio_client,
+    TWILIO_PHONE_NUMBER,
+    CALL_BATCH_MAX_RECIPIENTS,
+    CALL_QUEUE_POLL_SECONDS,
+)
+from utils import metrics
+from utils.call_queue import call_queue, JOB_COMPLETED, JOB_FAILED, JOB_UNKNOWN
+from utils.call_record import CallRecord
+from utils.message_templates import Segment, render_template
+from utils.phone_numbers import INVALID_PHONE_NUMBER, normalize_phone_number
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Simple in-memory storage for call batches (finished ones expire after an hour)
+call_batches: Dict[str, Dict] = {}
+CALL_BATCH_RETENTION_SECONDS = 3600
+# How many job statuses are looked up at once while following a batch
+BATCH_POLL_CONCURRENCY = 50
+
+# Per-recipient result states
+RESULT_QUEUED = "queued"
+RESULT_DISPATCHED = "dispatched"
+RESULT_FAILED = "failed"
+# The call may or may not have been placed (see JOB_UNKNOWN)
+RESULT_UNKNOWN = "unknown"
+RESULT_INVALID = "invalid"
+RESULT_DUPLICATE = "duplicate"
+
+
+class BatchRecipient(BaseModel):
+    phone_number: str
+    # Overrides the batch message; otherwise variables fill the batch template
+    message: Optional[str] = None
+    variables: Dict[str, str] = {}
+
+
+class BatchCallRequest(BaseModel):
+    recipients: List[BatchRecipient] = []
+    # Shorthand for recipients that only have a phone number
+    phone_numbers: List[str] = []
+    message: Optional[str] = None
+    template: Optional[str] = None
+    # Defaults for every recipient's template variables
+    variables: Dict[str, str] = {}
+
+
+def _prune_call_batches():
+    """Forget finished batches older than the retention period"""
+    cutoff = time.time() - CALL_BATCH_RETENTION_SECONDS
+    for batch_id in [
+        batch_id
+        for batch_id, batch in call_batches.items()
+        if batch["finished_at"] and batch["finished_at"] < cutoff
+    ]:
+        del call_batches[batch_id]
+
+
+def _render_message(
+    batch_request: BatchCallRequest, recipient: BatchRecipient
+) -> Tuple[str, Optional[List[Segment]]]:
+    """Return a recipient's message and segments; ValueError if there's none"""
+    if recipient.message:
+        message, segments = recipient.message, None
+    elif batch_request.template:
+        message, segments = render_template(
+            batch_request.template,
+            {**batch_request.variables, **recipient.variables},
+        )
+    else:
+        message, segments = batch_request.message, None
+    if not message or not message.strip():
+        raise ValueError("Either message or template is required")
+    return message, segments
+
+
+async def _record_result(batch: Dict, index: int, status: str, **fields):
+    """Settle one recipient's result and wake up anyone streaming the batch"""
+    result = batch["results"][index]
+    if result["status"] == RESULT_QUEUED:
+        batch[RESULT_QUEUED] -= 1
+    result["status"] = status
+    result.update(fields)
+    batch[status] += 1
+    batch["settled"].append(index)
+    async with batch["changed"]:
+        batch["changed"].notify_all()
+
+
+async def _run_call_batch(
+    batch: Dict,
+    pending: List[Tuple[int, str, Optional[List[Segment]]]],
+    base_url: str,
+):
+    """
+    Queue a batch's calls and follow their jobs until every one has settled
+
+    The calls are placed by the call queue workers, like /call/send, with
+    the same leases, retries and handling of unknown outcomes. Identical
+    messages are synthesized once: the worker's pre-synthesis of each call
+    joins the in-flight synthesis or hits the cache.
+    """
+    start = time.perf_counter()
+    jobs: Dict[str, int] = {}
+    for index, message, segments in pending:
+        record = CallRecord(
+            str(uuid.uuid4()),
+            message,
+            from_number=TWILIO_PHONE_NUMBER,
+            to_number=batch["results"][index]["phone_number"],
+            source="batch",
+            segments=segments,
+        )
+        try:
+            job_id = await call_queue.enqueue(
+                {"record": record.to_dict(), "base_url": base_url}
+            )
+        except Exception as e:
+            logger.error(f"Error queueing batch call: {str(e)}")
+            metrics.increment("call_batch_failed")
+            await _record_result(batch, index, RESULT_FAILED, error=str(e))
+            continue
+        batch["results"][index].update(job_id=job_id, call_id=record.call_id)
+        jobs[job_id] = index
+
+    async def settle(job_id: str):
+        try:
+            job = await call_queue.get(job_id)
+        except Exception as e:
+            logger.warning(f"Could not look up batch call job {job_id}: {str(e)}")
+            return
+        if job is None:
+            status, fields = RESULT_FAILED, {"error": "Call job not found"}
+        elif job["status"] == JOB_COMPLETED:
+            status, fields = RESULT_DISPATCHED, {"call_sid": job["call_sid"]}
+        elif job["status"] in (JOB_FAILED, JOB_UNKNOWN):
+            status = RESULT_FAILED if job["status"] == JOB_FAILED else RESULT_UNKNOWN
+            fields = {"error": job["error"]}
+        else:
+            return
+        metrics.increment(f"call_batch_{status}")
+        await _record_result(batch, jobs.pop(job_id), status, **fields)
+
+    while jobs:
+        await asyncio.sleep(CALL_QUEUE_POLL_SECONDS)
+        job_ids = list(jobs)
+        for offset in range(0, len(job_ids), BATCH_POLL_CONCURRENCY):
+            await asyncio.gather(
+                *map(settle, job_ids[offset : offset + BATCH_POLL_CONCURRENCY])
+            )
+
+    elapsed = time.perf_counter() - start
+    batch["status"] = "completed"
+    batch["finished_at"] = time.time()
+    async with batch["changed"]:
+        batch["changed"].notify_all()
+    logger.info(
+        f"Call batch {batch['batch_id']} finished in {elapsed:.1f}s: "
+        f"{batch[RESULT_DISPATCHED]} dispatched, {batch[RESULT_FAILED]} failed, "
+        f"{batch[RESULT_UNKNOWN]} unknown"
+    )
+
+
+@router.post("/call/batch", status_code=202)
+async def send_call_batch(batch_request: BatchCallRequest, request: Request):
+    """
+    Place the same (or a templated) message call to many phone numbers
+
+    Numbers are normalized, validated and deduplicated up front; invalid and
+    duplicate recipients get a result right away and are not called. The
+    rest are queued for the call queue workers. Returns a batch ID whose
+    results can be polled at GET /call/batch/{batch_id} or streamed as they
+    settle from GET /call/batch/{batch_id}/stream.
+    """
+    if not twilio_client or not TWILIO_PHONE_NUMBER:
+        raise HTTPException(status_code=500, detail="Twilio client not configured")
+
+    recipients = batch_request.recipients + [
+        BatchRecipient(phone_number=phone_number)
+        for phone_number in batch_request.phone_numbers
+    ]
+    if not recipients:
+        raise HTTPException(status_code=400, detail="No recipients")
+    if len(recipients) > CALL_BATCH_MAX_RECIPIENTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {CALL_BATCH_MAX_RECIPIENTS} recipients per batch",
+        )
+
+    _prune_call_batches()
+    batch_id = str(uuid.uuid4())
+    batch = {
+        "batch_id": batch_id,
+        "status": "running",
+        "total": len(recipients),
+        RESULT_QUEUED: 0,
+        RESULT_DISPATCHED: 0,
+        RESULT_FAILED: 0,
+        RESULT_UNKNOWN: 0,
+        RESULT_INVALID: 0,
+        RESULT_DUPLICATE: 0,
+        "created_at": time.time(),
+        "finished_at": None,
+        "results": [],
+        # Indexes of settled results, in the order they settled
+        "settled": [],
+        "changed": asyncio.Condition(),
+    }
+
+    pending = []
+    seen = set()
+    for index, recipient in enumerate(recipients):
+        phone_number = normalize_phone_number(recipient.phone_number)
+        batch["results"].append(
+            {
+                "phone_number": phone_number or recipient.phone_number,
+                "status": RESULT_QUEUED,
+            }
+        )
+        batch[RESULT_QUEUED] += 1
+        if phone_number is None:
+            await _record_result(
+                batch, index, RESULT_INVALID, error=INVALID_PHONE_NUMBER
+            )
+            continue
+        if phone_number in seen:
+            await _record_result(batch, index, RESULT_DUPLICATE)
+            continue
+        try:
+            message, segments = _render_message(batch_request, recipient)
+        except ValueError as e:
+            await _record_result(batch, index, RESULT_INVALID, error=str(e))
+            continue
+        seen.add(phone_number)
+        pending.append((index, message, segments))
+
+    call_batches[batch_id] = batch
+    batch["task"] = asyncio.create_task(
+        _run_call_batch(batch, pending, str(request.base_url))
+    )
+
+    logger.info(
+        f"Call batch {batch_id} started: {len(pending)} calls, "
+        f"{batch[RESULT_INVALID]} invalid, {batch[RESULT_DUPLICATE]} duplicate, "
+        f"{len(set(message for _, message, _ in pending))} unique messages"
+    )
+    return {
+        "batch_id": batch_id,
+        "status": batch["status"],
+        "total": batch["total"],
+        RESULT_QUEUED: batch[RESULT_QUEUED],
+        RESULT_INVALID: batch[RESULT_INVALID],
+        RESULT_DUPLICATE: batch[RESULT_DUPLICATE],
+    }
+
+
+def _get_call_batch(batch_id: str) -> Dict:
+    batch = call_batches.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Call batch not found")
+    return batch
+
+
+def _batch_summary(batch: Dict) -> Dict:
+    return {
+        key: value
+        for key, value in batch.items()
+        if key not in ("results", "settled", "changed", "task")
+    }
+
+
+@router.get("/call/batch/{batch_id}")
+async def get_call_batch(batch_id: str):
+    """Return a batch's progress and every recipient's result"""
+    batch = _get_call_batch(batch_id)
+    return {**_batch_summary(batch), "results": batch["results"]}
+
+
+@router.get("/call/batch/{batch_id}/stream")
+async def stream_call_batch(batch_id: str):
+    """
+    Stream a batch's results as newline-delimited JSON as they settle
+
+    Results already settled are sent first. The last line is the batch
+    summary, sent once every call has been dispatched, has failed or has
+    an unknown outcome.
+    """
+    batch = _get_call_batch(batch_id)
+
+    async def events():
+        sent = 0
+        while True:
+            async with batch["changed"]:
+                await batch["changed"].wait_for(
+                    lambda: len(batch["settled"]) > sent
+                    or batch["status"] == "completed"
+                )
+            settled = batch["settled"][sent:]
+            sent += len(settled)
+            for index in settled:
+                yield json.dumps({"index": index, **batch["results"][index]}) + "\n"
+            if batch["status"] == "completed" and sent == len(batch["settled"]):
+                yield json.dumps(_batch_summary(batch)) + "\n"
+                return
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
@@ -1,18 +1,42 @@
+import time
 import uuid
+import asyncio
 import logging
 import httpx
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Set, Tuple
 from fastapi import APIRouter, Form, Request
 from fastapi.responses import PlainTextResponse
 from twilio.twiml.messaging_response import MessagingResponse
-from config import twilio_client, TWILIO_PHONE_NUMBER
+from config import (
+    twilio_client,
+    TWILIO_PHONE_NUMBER,
+    CALL_ROUTING_MODE,
+    CALL_TOKEN_TTL_SECONDS,
+    CALL_STATE_TTL_SECONDS,
+    CALL_STATE_MAX_ENTRIES,
+)
 from pydantic import BaseModel
-from utils.elevenlabs import generate_elevenlabs_audio
+from utils import metrics
+from utils.elevenlabs import presynthesize_audio
+from utils.call_tokens import (
+    InvalidCallTokenError,
+    decode_call_token,
+    encode_call_token,
+)
+from utils.call_record import CallRecord
+from utils.call_state import call_state_store
+from utils.twilio_calls import create_call
 
 logger = logging.getLogger(__name__)
 
-# Simple in-memory storage for call data (in production, use a database)
-call_data_store: Dict[str, Dict] = {}
+# Pre-synthesis tasks (with their expiry) of calls whose record is kept
+# outside this process, by call ID; tasks can't be serialized
+audio_tasks: Dict[
+    str, Tuple[float, "asyncio.Task[Optional[List[Optional[str]]]]"]
+] = {}
+
+# Longer token URLs fall back to the call state store; Twilio caps URLs at 4000
+MAX_TOKEN_URL_LENGTH = 2048
 
 router = APIRouter()
 
@@ -93,19 +117,21 @@ async def handle_sms_webhook(request: Request):
             try:
                 # Store message data for use during the call
                 call_id = str(uuid.uuid4())
-                call_data_store[call_id] = {
-                    "sms_body": message_text,
-                    "from_number": TWILIO_PHONE_NUMBER,
-                    "to_number": phone_number,
-                    "message_sid": f"webhook_test_{call_id}",
-                }
-
-                # Generate webhook URL for the call
-                base_url = str(request.base_url).rstrip("/")
-                webhook_url = f"{base_url}/webhook/voice/call/{call_id}"
+                webhook_url = await register_call(
+                    CallRecord(
+                        call_id,
+                        message_text,
+                        from_number=TWILIO_PHONE_NUMBER,
+                        to_number=phone_number,
+                        source="webhook_test",
+                        # Synthesize while Twilio rings the callee
+                        audio_task=presynthesize_audio(message_text),
+                    ),
+                    str(request.base_url),
+                )
 
                 # Make the outbound call with webhook URL
-                call = twilio_client.calls.create(
+                call = await create_call(
                     url=webhook_url,
                     to=phone_number,
                     from_=TWILIO_PHONE_NUMBER,
@@ -231,6 +257,108 @@ async def handle_sms_status_webhook(
         return ""
 
 
-# Export call_data_store for use in voice routes
-def get_call_data_store():
-    return call_data_store
+def prune_audio_tasks():
+    """Forget pre-synthesis tasks of calls whose state has expired"""
+    now = time.time()
+    for call_id in [
+        call_id for call_id, (expires_at, _) in audio_tasks.items() if expires_at < now
+    ]:
+        del audio_tasks[call_id]
+    metrics.set_gauge("call_audio_tasks", len(audio_tasks))
+
+
+async def register_call(record: CallRecord, base_url: str) -> str:
+    """
+    Make a dispatched call's record available to its voice webhooks
+
+    Returns the webhook URL (under base_url, this server's public URL) to
+    give Twilio. In token routing mode the record
+    is carried in a signed token in the URL, so any replica can answer the
+    webhook; otherwise it is kept in the call state store. Backends that
+    can't hold the pre-synthesis task get it kept in audio_tasks instead.
+    """
+    base_url = base_url.rstrip("/")
+    if CALL_ROUTING_MODE == "token":
+        token = encode_call_token(record.to_dict())
+        webhook_url = f"{base_url}/webhook/voice/call/{token}"
+        if len(webhook_url) <= MAX_TOKEN_URL_LENGTH:
+            _keep_audio_task(record, CALL_TOKEN_TTL_SECONDS)
+            return webhook_url
+        logger.warning(
+            f"Call token for {record.call_id} is too long ({len(token)} chars), "
+            "keeping call data in the call state store"
+        )
+
+    if not call_state_store.keeps_objects:
+        _keep_audio_task(record, CALL_STATE_TTL_SECONDS)
+    await call_state_store.put(record)
+    return f"{base_url}/webhook/voice/call/{record.call_id}"
+
+
+def _keep_audio_task(record: CallRecord, ttl: float):
+    if record.audio_task is None:
+        return
+    audio_tasks[record.call_id] = (time.time() + ttl, record.audio_task)
+    # Oldest first: dicts keep insertion order
+    while len(audio_tasks) > CALL_STATE_MAX_ENTRIES:
+        del audio_tasks[next(iter(audio_tasks))]
+        metrics.increment("call_audio_task_evictions")
+
+
+async def get_call_data(call_ref: str) -> Optional[CallRecord]:
+    """Return the record for a call ID or call token, or None if unknown"""
+    if "." in call_ref:
+        try:
+            record = CallRecord.from_dict(decode_call_token(call_ref))
+        except InvalidCallTokenError as e:
+            logger.warning(f"Rejected call token: {str(e)}")
+            return None
+    else:
+        record = await call_state_store.get(call_ref)
+        if record is None:
+            return None
+
+    if record.audio_task is None and record.call_id in audio_tasks:
+        record.audio_task = audio_tasks[record.call_id][1]
+    return record
+
+
+async def update_call_status(call_ref: str, record: CallRecord, status: str):
+    """Record a call's progress (token-routed calls have nowhere to save it)"""
+    record.set_status(status)
+    if "." not in call_ref:
+        await call_state_store.put(record)
+
+
+async def forget_call(call_ref: str):
+    """Drop the state of a finished call"""
+    if "." not in call_ref:
+        await call_state_store.delete(call_ref)
+        audio_tasks.pop(call_ref, None)
+        return
+    try:
+        audio_tasks.pop(decode_call_token(call_ref)["call_id"], None)
+    except InvalidCallTokenError:
+        pass
+
+
+def get_active_audio_files() -> Set[str]:
+    """Return the audio filenames referenced by calls still in progress"""
+    filenames = set()
+    tasks = [task for _, task in audio_tasks.values()]
+    for record in call_state_store.local_records():
+        if record.audio_files:
+            filenames.update(record.audio_files)
+        elif record.audio_task is not None:
+            tasks.append(record.audio_task)
+
+    # Failed syntheses left no files to protect and must not break the sweep
+    for audio_task in tasks:
+        if (
+            audio_task.done()
+            and not audio_task.cancelled()
+            and audio_task.exception() is None
+        ):
+            # Chunks that failed to synthesize have no filename
+            filenames.update(filter(None, audio_task.result() or []))
+    return filenames
@@ -0,0 +1,100 @@
+import time
+import uuid
+import asyncio
+import logging
+from typing import Dict, List
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from config import TTS_WARM_CONCURRENCY
+from utils.elevenlabs import synthesize_text
+from utils.tts_scheduler import PRIORITY_WARMUP
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Simple in-memory storage for warm jobs (finished jobs expire after an hour)
+warm_jobs: Dict[str, Dict] = {}
+WARM_JOB_RETENTION_SECONDS = 3600
+
+
+class WarmRequest(BaseModel):
+    # Warmed with the default voice and model, the only ones calls use
+    texts: List[str]
+
+
+def _prune_warm_jobs():
+    """Forget finished jobs older than the retention period"""
+    cutoff = time.time() - WARM_JOB_RETENTION_SECONDS
+    for job_id in [
+        job_id
+        for job_id, job in warm_jobs.items()
+        if job["finished_at"] and job["finished_at"] < cutoff
+    ]:
+        del warm_jobs[job_id]
+
+
+async def _run_warm_job(job: Dict, texts: List[str]):
+    """Synthesize every text through the cache at a bounded concurrency"""
+    semaphore = asyncio.Semaphore(TTS_WARM_CONCURRENCY)
+
+    async def warm(text: str):
+        async with semaphore:
+            filenames = await synthesize_text(text, PRIORITY_WARMUP)
+        if filenames:
+            job["completed"] += 1
+        else:
+            job["failed"] += 1
+            job["failed_texts"].append(text)
+
+    await asyncio.gather(*(warm(text) for text in texts))
+    job["status"] = "completed"
+    job["finished_at"] = time.time()
+    logger.info(
+        f"TTS warm job {job['job_id']} finished: "
+        f"{job['completed']} warmed, {job['failed']} failed"
+    )
+
+
+@router.post("/tts/warm", status_code=202)
+async def warm_tts_cache(warm_request: WarmRequest):
+    """
+    Pre-synthesize a batch of texts into the audio cache
+
+    Texts are deduplicated and synthesized in the background at low priority,
+    so calls placed later for the same texts are cache hits. Returns a job ID
+    whose progress can be polled at GET /tts/warm/{job_id}.
+    """
+    # Deduplicate while keeping the submitted order. Texts aren't stripped,
+    # as calls synthesize their message as sent and must hit the same key.
+    texts = list(dict.fromkeys(t for t in warm_request.texts if t.strip()))
+    if not texts:
+        raise HTTPException(status_code=400, detail="No texts to warm")
+
+    _prune_warm_jobs()
+    job_id = str(uuid.uuid4())
+    job = {
+        "job_id": job_id,
+        "status": "running",
+        "total": len(texts),
+        "skipped": len(warm_request.texts) - len(texts),
+        "completed": 0,
+        "failed": 0,
+        "failed_texts": [],
+        "created_at": time.time(),
+        "finished_at": None,
+    }
+    warm_jobs[job_id] = job
+    job["task"] = asyncio.create_task(_run_warm_job(job, texts))
+
+    logger.info(f"TTS warm job {job_id} started for {len(texts)} texts")
+    return {"job_id": job_id, "status": job["status"], "total": job["total"]}
+
+
+@router.get("/tts/warm/{job_id}")
+async def get_warm_job(job_id: str):
+    """Return the progress of a cache warming job"""
+    job = warm_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Warm job not found")
+    return {key: value for key, value in job.items() if key != "task"}
@@ -1,10 +1,28 @@
 import logging
-from typing import Optional
+from typing import Awaitable, Callable, Dict, Optional
 from fastapi import APIRouter, Form, Request, HTTPException
 from fastapi.responses import PlainTextResponse
 from twilio.twiml.voice_response import VoiceResponse, Gather
-from utils.elevenlabs import generate_elevenlabs_audio
-from routes.sms_routes import get_call_data_store
+from utils.elevenlabs import presynthesize_audio, resolve_call_audio
+from utils.prompts import add_prompt
+from utils.message_templates import render_template
+from utils.phone_numbers import INVALID_PHONE_NUMBER, normalize_phone_number
+from routes.sms_routes import (
+    forget_call,
+    get_call_data,
+    register_call,
+    update_call_status,
+)
+from utils.call_record import CallRecord, CALL_IN_PROGRESS
+from utils.twilio_calls import CallOutcomeUnknownError, create_call
+from utils.call_pacing import PacingDelayError
+from utils.call_queue import (
+    call_queue,
+    mark_sending,
+    JobDeferredError,
+    JobOutcomeUnknownError,
+    JOB_QUEUED,
+)
 from pydantic import BaseModel
 from config import twilio_client, TWILIO_PHONE_NUMBER
 import uuid
@@ -15,69 +33,153 @@ router = APIRouter()
 
 
 class CallRequest(BaseModel):
-    message: str
     phone_number: str
+    message: Optional[str] = None
+    # Alternatively a template like "Hi {name}, your appointment is at {time}"
+    template: Optional[str] = None
+    variables: Dict[str, str] = {}
+
+
+def _say_message(response: VoiceResponse, text: str):
+    """Speak (part of) a message with Twilio TTS"""
+    response.say(
+        f"<speak><prosody rate='medium' pitch='high' volume='medium'>{text}</prosody></speak>",
+        voice="Polly.Emma",  # Cheerful British female voice
+    )
+
+
+async def dispatch_call(
+    record: CallRecord,
+    base_url: str,
+    max_wait: Optional[float] = None,
+    before_request: Optional[Callable[[], Awaitable[None]]] = None,
+):
+    """
+    Store a call's record and ask Twilio to place the call
+
+    Returns Twilio's call instance. Twilio fetches the call's webhooks from
+    base_url, this server's public URL. Raises PacingDelayError if the call
+    would have to wait more than max_wait seconds for a CPS slot;
+    before_request is awaited right before the call is placed.
+    """
+    # Store message data for use during the call
+    webhook_url = await register_call(record, base_url)
+
+    # Make the outbound call with webhook URL
+    call = await create_call(
+        url=webhook_url,
+        to=record.to_number,
+        from_=record.from_number,
+        max_wait=max_wait,
+        before_request=before_request,
+    )
+
+    logger.info(
+        f"Outbound call initiated: {call.sid} to {record.to_number} with call_id: {record.call_id}"
+    )
+    return call
 
 
-@router.post("/call/send")
+@router.post("/call/send", status_code=202)
 async def send_call_with_message(call_request: CallRequest, request: Request):
     """
     Send a call with a custom message to a phone number
 
-    This endpoint receives a JSON payload with a message and phone number,
-    then initiates an outbound call to deliver that message.
+    This endpoint receives a JSON payload with a message (or a template plus
+    variables) and phone number, then queues an outbound call to deliver
+    that message. The call is placed by a call queue worker, with retries;
+    its progress can be polled at GET /call/jobs/{job_id}.
     """
     try:
         if not twilio_client or not TWILIO_PHONE_NUMBER:
             raise HTTPException(status_code=500, detail="Twilio client not configured")
 
-        # Validate phone number format (basic validation)
-        if not call_request.phone_number.startswith("+"):
+        phone_number = normalize_phone_number(call_request.phone_number)
+        if phone_number is None:
+            raise HTTPException(status_code=400, detail=INVALID_PHONE_NUMBER)
+
+        # Templates are synthesized segment by segment so the static parts
+        # are cached once and shared across calls
+        message, segments = call_request.message, None
+        if call_request.template:
+            try:
+                message, segments = render_template(
+                    call_request.template, call_request.variables
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        if not message or not message.strip():
             raise HTTPException(
-                status_code=400,
-                detail="Phone number must include country code (e.g., +1234567890)",
+                status_code=400, detail="Either message or template is required"
             )
 
-        # Store message data for use during the call
+        # Queue the call; a worker places it (see run_call_job)
         call_id = str(uuid.uuid4())
-        call_data_store = get_call_data_store()
-        call_data_store[call_id] = {
-            "sms_body": call_request.message,
-            "from_number": TWILIO_PHONE_NUMBER,
-            "to_number": call_request.phone_number,
-            "message_sid": f"api_call_{call_id}",
-        }
-
-        # Generate webhook URL for the call
-        base_url = str(request.base_url).rstrip("/")
-        webhook_url = f"{base_url}/webhook/voice/call/{call_id}"
-
-        # Make the outbound call with webhook URL
-        call = twilio_client.calls.create(
-            url=webhook_url,
-            to=call_request.phone_number,
-            from_=TWILIO_PHONE_NUMBER,
+        record = CallRecord(
+            call_id,
+            message,
+            from_number=TWILIO_PHONE_NUMBER,
+            to_number=phone_number,
+            segments=segments,
+        )
+        job_id = await call_queue.enqueue(
+            {"record": record.to_dict(), "base_url": str(request.base_url)}
         )
 
         logger.info(
-            f"Outbound call initiated: {call.sid} to {call_request.phone_number} with call_id: {call_id}"
+            f"Outbound call queued: job {job_id} to {phone_number} with call_id: {call_id}"
         )
 
         return {
             "success": True,
-            "call_sid": call.sid,
+            "job_id": job_id,
             "call_id": call_id,
-            "message": "Call initiated successfully",
-            "phone_number": call_request.phone_number,
+            "status": JOB_QUEUED,
+            "message": "Call queued successfully",
+            "phone_number": phone_number,
         }
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error initiating call: {str(e)}")
-        raise HTTPException(
-            status_code=500, detail=f"Failed to initiate call: {str(e)}"
+        logger.error(f"Error queueing call: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to queue call: {str(e)}")
+
+
+async def run_call_job(job: Dict) -> str:
+    """Place the call of a queued /call/send or /call/batch job; return its SID"""
+    record = CallRecord.from_dict(job["payload"]["record"])
+    # Synthesize while Twilio rings the callee
+    record.audio_task = presynthesize_audio(record.sms_body, segments=record.segments)
+    try:
+        # Don't hold the job for longer than a lease while other calls (e.g.
+        # a /call/batch) use up the CPS limit; hand it back until its slot
+        call = await dispatch_call(
+            record,
+            job["payload"]["base_url"],
+            max_wait=call_queue.lease_seconds,
+            before_request=lambda: mark_sending(job),
         )
+    except PacingDelayError as e:
+        raise JobDeferredError(e.retry_after, str(e))
+    except CallOutcomeUnknownError as e:
+        # Retrying could ring the callee twice
+        raise JobOutcomeUnknownError(str(e))
+    return call.sid
+
+
+@router.get("/call/jobs/{job_id}")
+async def get_call_job(job_id: str):
+    """Return the status of a queued call, with its call SID once placed"""
+    job = await call_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Call job not found")
+    record = job.pop("payload")["record"]
+    return {
+        **job,
+        "call_id": record["call_id"],
+        "phone_number": record["to_number"],
+    }
 
 
 @router.api_route(
@@ -92,9 +194,9 @@ async def handle_voice_call_webhook(call_id: str, request: Request):
     This endpoint handles the initial call and presents options to the user
     """
     try:
-        # Get call data from storage
-        call_data_store = get_call_data_store()
-        if call_id not in call_data_store:
+        # Get call data from storage (or from the signed call token)
+        record = await get_call_data(call_id)
+        if record is None:
             logger.error(f"Call data not found for call_id: {call_id}")
             response = VoiceResponse()
             response.say(
@@ -103,24 +205,26 @@ async def handle_voice_call_webhook(call_id: str, request: Request):
             response.hangup()
             return str(response)
 
-        call_data = call_data_store[call_id]
-        sms_body = call_data["sms_body"]
+        sms_body = record.sms_body
 
         response = VoiceResponse()
 
-        # Try to generate audio with ElevenLabs first
-        audio_url = await generate_elevenlabs_audio(sms_body, request)
-
-        if audio_url:
-            # Use ElevenLabs generated audio
-            response.play(audio_url)
+        # Try ElevenLabs audio first (usually pre-synthesized at dispatch time)
+        audio_parts = await resolve_call_audio(record, request)
+        await update_call_status(call_id, record, CALL_IN_PROGRESS)
+
+        if audio_parts:
+            # Use ElevenLabs generated audio (one <Play> per sentence chunk),
+            # with Twilio TTS for any chunk that failed to synthesize
+            for audio_url, text in audio_parts:
+                if audio_url:
+                    response.play(audio_url)
+                else:
+                    _say_message(response, text)
             response.pause(length=1)
         else:
             # Fallback to Twilio TTS with improved voice
-            response.say(
-                f"<speak><prosody rate='medium' pitch='high' volume='medium'>{sms_body}</prosody></speak>",
-                voice="Polly.Emma",  # Cheerful British female voice
-            )
+            _say_message(response, sms_body)
             response.pause(length=1)
 
         # Add IVR options
@@ -131,18 +235,12 @@ async def handle_voice_call_webhook(call_id: str, request: Request):
             method="POST",
         )
 
-        gather.say(
-            "<speak><prosody rate='medium' pitch='high' volume='medium'>Press 1 to end the call, or press 2 for a special message.</prosody></speak>",
-            voice="Polly.Emma",
-        )
+        add_prompt(gather, "menu", request)
 
         response.append(gather)
 
         # If no input is received, repeat the options
-        response.say(
-            "<speak><prosody rate='medium' pitch='high' volume='medium'>I didn't receive any input. Goodbye!</prosody></speak>",
-            voice="Polly.Emma",
-        )
+        add_prompt(response, "no_input", request)
         response.hangup()
 
         return str(response)
@@ -184,35 +282,21 @@ async def handle_voice_input_webhook(
 
         if digits == "1":
             # User pressed 1 - end the call
-            response.say(
-                "<speak><prosody rate='medium' pitch='high' volume='medium'>Goodbye!</prosody></speak>",
-                voice="Polly.Emma",
-            )
+            add_prompt(response, "goodbye", request)
             response.hangup()
         elif digits == "2":
             # User pressed 2 - special message
-            response.say(
-                "<speak><prosody rate='medium' pitch='high' volume='medium'>Thanks for picking up the phone dude!</prosody></speak>",
-                voice="Polly.Emma",
-            )
+            add_prompt(response, "special_message", request)
             response.pause(length=1)
-            response.say(
-                "<speak><prosody rate='medium' pitch='high' volume='medium'>Have a great day!</prosody></speak>",
-                voice="Polly.Emma",
-            )
+            add_prompt(response, "have_a_great_day", request)
             response.hangup()
         else:
             # Invalid input or no input
-            response.say(
-                "<speak><prosody rate='medium' pitch='high' volume='medium'>Invalid option. Goodbye!</prosody></speak>",
-                voice="Polly.Emma",
-            )
+            add_prompt(response, "invalid_option", request)
             response.hangup()
 
         # Clean up call data after processing
-        call_data_store = get_call_data_store()
-        if call_id in call_data_store:
-            del call_data_store[call_id]
+        await forget_call(call_id)
 
         return str(response)
 
@@ -0,0 +1,351 @@
+import os
+import json
+import time
+import fcntl
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set
+from config import (
+    AUDIO_DIR,
+    TTS_CACHE_MAX_BYTES,
+    TTS_CACHE_INDEX_PATH,
+    ACTIVE_AUDIO_PUBLISH_SECONDS,
+)
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# A worker's published active files are ignored (and removed) once they are
+# this old, since the worker has stopped
+ACTIVE_AUDIO_STALE_SECONDS = 3 * ACTIVE_AUDIO_PUBLISH_SECONDS
+
+
+def cache_key(
+    text: str,
+    voice_id: str,
+    model_id: str,
+    voice_settings: Dict[str, Any],
+    output_format: str,
+) -> str:
+    """
+    Build a content address for a synthesis request
+
+    Every input that changes the produced audio is part of the hash, so two
+    requests share a file only if they would get identical audio back.
+    """
+    payload = json.dumps(
+        {
+            "text": text,
+            "voice_id": voice_id,
+            "model_id": model_id,
+            "voice_settings": voice_settings,
+            "output_format": output_format,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _read_index(index_path: str) -> List[Dict[str, Any]]:
+    """Return the entries saved in an index file, oldest first"""
+    if not os.path.exists(index_path):
+        return []
+    with open(index_path, "r") as f:
+        return json.load(f).get("entries", [])
+
+
+def _write_active_files(path: str, filenames: Set[str]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(sorted(filenames), f)
+    os.replace(tmp_path, path)
+
+
+def _read_active_files(directory: str, own_path: str) -> Set[str]:
+    """Union the active files other live workers published to directory"""
+    filenames: Set[str] = set()
+    if not os.path.isdir(directory):
+        return filenames
+    now = time.time()
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.path == own_path or not entry.name.endswith(".json"):
+                continue
+            try:
+                if now - entry.stat().st_mtime > ACTIVE_AUDIO_STALE_SECONDS:
+                    os.remove(entry.path)
+                    continue
+                with open(entry.path, "r") as f:
+                    filenames.update(json.load(f))
+            except (FileNotFoundError, ValueError):
+                pass
+    return filenames
+
+
+def _remove_files(directory: str, entries: List[Dict[str, Any]]):
+    """Delete evicted files, keeping any rewritten since they were cached"""
+    for entry in entries:
+        filepath = os.path.join(directory, entry["filename"])
+        try:
+            # The same content may have been synthesized again since eviction
+            mtime = entry.get("mtime")
+            if mtime is not None and os.stat(filepath).st_mtime != mtime:
+                continue
+            os.remove(filepath)
+        except FileNotFoundError:
+            pass
+
+
+class AudioCache:
+    """
+    Content-addressed on-disk cache of synthesized audio with LRU eviction
+
+    Entries are kept in least-recently-used order and evicted once the total
+    size exceeds the byte budget. Pinned entries and files still referenced
+    by calls in progress (as returned by protected_files) are never evicted.
+    Workers sharing the directory publish their protected files under
+    ".active" so none of them evicts audio another worker's calls still use.
+    The index is persisted to a JSON file so the cache survives restarts;
+    workers sharing the directory merge their entries into it.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, index_path: str):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_path = index_path
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.total_bytes = 0
+        # Set on startup to the filenames this worker's active calls reference
+        self.protected_files: Optional[Callable[[], Set[str]]] = None
+        self.active_dir = os.path.join(directory, ".active")
+        self.active_path = os.path.join(self.active_dir, f"{os.getpid()}.json")
+        self._save_lock = asyncio.Lock()
+        self._evicting: Optional["asyncio.Task[None]"] = None
+        self._load()
+
+    def _load(self):
+        """Load the persisted index, dropping entries whose file is gone"""
+        try:
+            saved = _read_index(self.index_path)
+        except Exception as e:
+            logger.error(f"Could not load TTS cache index: {str(e)}")
+            return
+
+        # Entries are saved in LRU order, oldest first
+        for entry in saved:
+            filepath = os.path.join(self.directory, entry["filename"])
+            if os.path.exists(filepath):
+                self.entries[entry["key"]] = entry
+                self.total_bytes += entry["size"]
+
+        metrics.set_gauge("tts_cache_bytes", self.total_bytes)
+        metrics.set_gauge("tts_cache_entries", len(self.entries))
+        logger.info(
+            f"TTS cache loaded: {len(self.entries)} entries, {self.total_bytes} bytes"
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached filename for a key and mark it recently used"""
+        entry = self.entries.get(key)
+        if entry is not None and os.path.exists(
+            os.path.join(self.directory, entry["filename"])
+        ):
+            self.entries.move_to_end(key)
+            entry["last_access"] = time.time()
+            metrics.increment("tts_cache_hits")
+            return entry["filename"]
+
+        if entry is not None:
+            # File was removed behind our back; forget about it
+            self._forget(key)
+
+        metrics.increment("tts_cache_misses")
+        return None
+
+    def put(
+        self,
+        key: str,
+        filename: str,
+        pinned: bool = False,
+        digest: Optional[str] = None,
+    ):
+        """
+        Register a newly written file and start evicting old entries if the
+        cache is over budget
+
+        digest is the SHA-256 of the audio payload, served as the file's ETag.
+        """
+        stat = os.stat(os.path.join(self.directory, filename))
+        size = stat.st_size
+        if key in self.entries:
+            pinned = pinned or self.entries[key].get("pinned", False)
+            self._forget(key)
+
+        self.entries[key] = {
+            "key": key,
+            "filename": filename,
+            "size": size,
+            "mtime": stat.st_mtime,
+            "last_access": time.time(),
+            "pinned": pinned,
+            "digest": digest,
+        }
+        self.total_bytes += size
+        self._update_gauges()
+        self._evict_if_over_budget()
+
+    def pin(self, key: str):
+        """Exempt an entry from LRU eviction (used for static prompt audio)"""
+        if key in self.entries:
+            self.entries[key]["pinned"] = True
+
+    def discard(self, key: str):
+        """Forget an entry whose file is being removed outside the cache"""
+        if key in self.entries:
+            self._forget(key)
+            self._update_gauges()
+
+    def _evict_if_over_budget(self):
+        if self.total_bytes > self.max_bytes and self._evicting is None:
+            self._evicting = asyncio.create_task(self._evict())
+
+    def _forget(self, key: str):
+        entry = self.entries.pop(key)
+        self.total_bytes -= entry["size"]
+
+    async def _evict(self):
+        """
+        Evict least-recently-used entries until we are within budget
+
+        One pass runs at a time, in the background, for however many inserts
+        went over budget: the active calls' files are looked up once per pass
+        and the evicted files are deleted in a worker thread.
+        """
+        try:
+            while self.total_bytes > self.max_bytes:
+                protected = await self.shared_protected_files()
+                victims = []
+                for key, entry in list(self.entries.items())[:-1]:
+                    if self.total_bytes <= self.max_bytes:
+                        break
+                    if entry.get("pinned") or entry["filename"] in protected:
+                        continue
+                    self._forget(key)
+                    victims.append(entry)
+                    metrics.increment("tts_cache_evictions")
+                    logger.info(
+                        f"TTS cache evicted {entry['filename']} ({entry['size']} bytes)"
+                    )
+                if not victims:
+                    break
+                self._update_gauges()
+                await asyncio.to_thread(_remove_files, self.directory, victims)
+        finally:
+            self._evicting = None
+
+    async def publish_protected_files(self) -> Set[str]:
+        """Publish the files this worker's active calls reference; return them"""
+        protected = self.protected_files() if self.protected_files else set()
+        try:
+            await asyncio.to_thread(_write_active_files, self.active_path, protected)
+        except Exception as e:
+            logger.error(f"Could not publish active audio files: {str(e)}")
+        return protected
+
+    async def shared_protected_files(self) -> Set[str]:
+        """Return the files active calls on any worker sharing the directory use"""
+        protected = await self.publish_protected_files()
+        others = await asyncio.to_thread(
+            _read_active_files, self.active_dir, self.active_path
+        )
+        return protected | others
+
+    def _update_gauges(self):
+        metrics.set_gauge("tts_cache_bytes", self.total_bytes)
+        metrics.set_gauge("tts_cache_entries", len(self.entries))
+
+    async def save(self):
+        """
+        Persist the index atomically without blocking the event loop
+
+        Workers sharing the directory each save the index, so it is merged
+        rather than overwritten: under an exclusive lock, entries other
+        workers saved (whose files still exist) are kept and adopted here,
+        and the result is written through a per-process temp file.
+        """
+        ours = list(self.entries.values())
+
+        def merge_and_write() -> List[Dict[str, Any]]:
+            with open(f"{self.index_path}.lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    saved = _read_index(self.index_path)
+                except ValueError:
+                    # A corrupt index is replaced by ours
+                    saved = []
+                known = {entry["key"] for entry in ours}
+                adopted = [
+                    entry
+                    for entry in saved
+                    if entry["key"] not in known
+                    and os.path.exists(os.path.join(self.directory, entry["filename"]))
+                ]
+                merged = sorted(ours + adopted, key=lambda e: e["last_access"])
+                tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump({"entries": merged}, f)
+                os.replace(tmp_path, self.index_path)
+                return adopted
+
+        try:
+            async with self._save_lock:
+                adopted = await asyncio.to_thread(merge_and_write)
+        except Exception as e:
+            logger.error(f"Could not save TTS cache index: {str(e)}")
+            return
+
+        adopted = [entry for entry in adopted if entry["key"] not in self.entries]
+        if adopted:
+            for entry in adopted:
+                self.entries[entry["key"]] = entry
+                self.total_bytes += entry["size"]
+            # Keep LRU order across our entries and the adopted ones
+            self.entries = OrderedDict(
+                sorted(self.entries.items(), key=lambda item: item[1]["last_access"])
+            )
+            self._update_gauges()
+            self._evict_if_over_budget()
+
+    def digest(self, key: str) -> Optional[str]:
+        """Return the stored payload digest for a key without touching LRU order"""
+        entry = self.entries.get(key)
+        return entry.get("digest") if entry is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the cache size and budget"""
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+audio_cache = AudioCache(AUDIO_DIR, TTS_CACHE_MAX_BYTES, TTS_CACHE_INDEX_PATH)
+
+
+async def run_active_files_publisher():
+    """Publish this worker's protected files every ACTIVE_AUDIO_PUBLISH_SECONDS"""
+    try:
+        while True:
+            await audio_cache.publish_protected_files()
+            await asyncio.sleep(ACTIVE_AUDIO_PUBLISH_SECONDS)
+    finally:
+        # A stopped worker protects nothing
+        try:
+            os.remove(audio_cache.active_path)
+        except FileNotFoundError:
+            pass
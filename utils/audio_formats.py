@@ -0,0 +1,55 @@
+import struct
+import mimetypes
+from typing import NamedTuple
+
+
+class AudioFormat(NamedTuple):
+    """An ElevenLabs output format and how we store and serve it"""
+
+    extension: str
+    content_type: str
+    # What ElevenLabs sends back for this format
+    accept: str
+    # Raw 8 kHz mu-law has no container; we wrap it in a WAV header for Twilio
+    wrap_ulaw_wav: bool = False
+
+
+# ElevenLabs output_format values we support. Phone audio is 8 kHz mu-law, so
+# ulaw_8000 is what Twilio plays without transcoding; the low-bitrate MP3
+# variants are much smaller than the 44.1 kHz/128 kbps default.
+AUDIO_FORMATS = {
+    "mp3_44100_128": AudioFormat("mp3", "audio/mpeg", "audio/mpeg"),
+    "mp3_44100_64": AudioFormat("mp3", "audio/mpeg", "audio/mpeg"),
+    "mp3_44100_32": AudioFormat("mp3", "audio/mpeg", "audio/mpeg"),
+    "mp3_22050_32": AudioFormat("mp3", "audio/mpeg", "audio/mpeg"),
+    "ulaw_8000": AudioFormat("wav", "audio/wav", "audio/basic", wrap_ulaw_wav=True),
+}
+
+ULAW_SAMPLE_RATE = 8000
+
+mimetypes.add_type("audio/wav", ".wav")
+
+
+def get_audio_format(name: str) -> AudioFormat:
+    """Look up an output format, raising ValueError for unsupported names"""
+    if name not in AUDIO_FORMATS:
+        raise ValueError(
+            f"Unsupported audio output format '{name}'. "
+            f"Supported formats: {', '.join(AUDIO_FORMATS)}"
+        )
+    return AUDIO_FORMATS[name]
+
+
+def ulaw_wav_header(data_size: int) -> bytes:
+    """Build a 44-byte WAV header for mono 8 kHz 8-bit mu-law samples"""
+    return (
+        b"RIFF"
+        + struct.pack("<I", 36 + data_size)
+        + b"WAVE"
+        + b"fmt "
+        # chunk size, format 7 (mu-law), channels, sample rate, byte rate,
+        # block align, bits per sample
+        + struct.pack("<IHHIIHH", 16, 7, 1, ULAW_SAMPLE_RATE, ULAW_SAMPLE_RATE, 1, 8)
+        + b"data"
+        + struct.pack("<I", data_size)
+    )
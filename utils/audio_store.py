@@ -0,0 +1,280 @@
+import os
+import hmac
+import uuid
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Optional
+from urllib.parse import quote
+import httpx
+from config import (
+    AUDIO_STORE,
+    AUDIO_STORE_S3_ENDPOINT,
+    AUDIO_STORE_S3_BUCKET,
+    AUDIO_STORE_S3_PREFIX,
+    AUDIO_STORE_S3_REGION,
+    AUDIO_STORE_S3_ACCESS_KEY,
+    AUDIO_STORE_S3_SECRET_KEY,
+    AUDIO_STORE_TIMEOUT,
+    TTS_STREAM_CHUNK_BYTES,
+)
+from utils import metrics
+from utils.audio_formats import AUDIO_FORMATS
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {fmt.extension: fmt.content_type for fmt in AUDIO_FORMATS.values()}
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+
+
+class AudioStore:
+    """
+    Base class for where generated audio lives beyond this process
+
+    AUDIO_DIR is always the working copy that files are written to and served
+    from. A shared store additionally keeps every file so other replicas can
+    pull in audio they didn't generate instead of synthesizing it again.
+    """
+
+    name = "base"
+    shared = False
+
+    async def start(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        """Open long-lived resources (connection pools)"""
+
+    async def close(self):
+        """Release long-lived resources"""
+
+    async def upload(self, filename: str, path: str, digest: Optional[str]) -> bool:
+        """Copy a local audio file into the store; returns whether it succeeded"""
+        return True
+
+    async def download(self, filename: str, path: str) -> Optional[str]:
+        """
+        Copy an audio file from the store to path
+
+        Returns the payload digest recorded at upload ("" if none was), or
+        None if the store doesn't have the file.
+        """
+        return None
+
+
+class LocalAudioStore(AudioStore):
+    """Audio only lives in this node's AUDIO_DIR (single-node deployments)"""
+
+    name = "local"
+
+
+def sigv4_headers(
+    method: str,
+    url: httpx.URL,
+    headers: Dict[str, str],
+    access_key: str,
+    secret_key: str,
+    region: str,
+    now: Optional[datetime] = None,
+    payload_hash: str = UNSIGNED_PAYLOAD,
+) -> Dict[str, str]:
+    """
+    Sign an S3 request with AWS Signature Version 4
+
+    Returns headers plus the Host, x-amz-date, x-amz-content-sha256 and
+    Authorization headers. Every header passed in is signed.
+    """
+    now = now or datetime.now(timezone.utc)
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    date = amz_date[:8]
+
+    signed = {key.lower(): value.strip() for key, value in headers.items()}
+    signed["host"] = url.netloc.decode("ascii")
+    signed["x-amz-date"] = amz_date
+    signed["x-amz-content-sha256"] = payload_hash
+    signed_names = ";".join(sorted(signed))
+
+    query = "&".join(
+        f"{quote(key, safe='-_.~')}={quote(value, safe='-_.~')}"
+        for key, value in sorted(url.params.multi_items())
+    )
+    canonical_request = "\n".join(
+        [
+            method,
+            quote(url.path, safe="/-_.~"),
+            query,
+            "".join(f"{name}:{signed[name]}\n" for name in sorted(signed)),
+            signed_names,
+            payload_hash,
+        ]
+    )
+
+    scope = f"{date}/{region}/s3/aws4_request"
+    string_to_sign = "\n".join(
+        [
+            "AWS4-HMAC-SHA256",
+            amz_date,
+            scope,
+            hashlib.sha256(canonical_request.encode()).hexdigest(),
+        ]
+    )
+
+    signing_key = f"AWS4{secret_key}".encode()
+    for part in (date, region, "s3", "aws4_request"):
+        signing_key = hmac.new(signing_key, part.encode(), hashlib.sha256).digest()
+    signature = hmac.new(
+        signing_key, string_to_sign.encode(), hashlib.sha256
+    ).hexdigest()
+
+    signed["authorization"] = (
+        f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+        f"SignedHeaders={signed_names}, Signature={signature}"
+    )
+    return signed
+
+
+class S3AudioStore(AudioStore):
+    """
+    Audio kept in an S3-compatible bucket (AWS S3, MinIO, R2, ...)
+
+    Uses path-style object URLs ({endpoint}/{bucket}/{prefix}{filename}) so
+    it works against self-hosted services without DNS-style bucket names.
+    Objects carry the payload digest as metadata so every replica serves the
+    same ETag for a file.
+    """
+
+    name = "s3"
+    shared = True
+
+    def __init__(
+        self,
+        endpoint: str = AUDIO_STORE_S3_ENDPOINT,
+        bucket: str = AUDIO_STORE_S3_BUCKET,
+        prefix: str = AUDIO_STORE_S3_PREFIX,
+        region: str = AUDIO_STORE_S3_REGION,
+        access_key: str = AUDIO_STORE_S3_ACCESS_KEY,
+        secret_key: str = AUDIO_STORE_S3_SECRET_KEY,
+    ):
+        if not bucket:
+            raise ValueError("AUDIO_STORE_S3_BUCKET must be set for the s3 store")
+        self.endpoint = endpoint.rstrip("/")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.region = region
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.client: Optional[httpx.AsyncClient] = None
+
+    async def start(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        """Open the shared HTTP client for the bucket"""
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                timeout=AUDIO_STORE_TIMEOUT, transport=transport
+            )
+            logger.info(f"S3 audio store started for bucket {self.bucket}")
+
+    async def close(self):
+        """Close the shared HTTP client"""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def _object_url(self, filename: str) -> httpx.URL:
+        return httpx.URL(f"{self.endpoint}/{self.bucket}/{self.prefix}{filename}")
+
+    def _signed(self, method: str, url: httpx.URL, headers: Dict[str, str]):
+        return sigv4_headers(
+            method, url, headers, self.access_key, self.secret_key, self.region
+        )
+
+    async def upload(self, filename: str, path: str, digest: Optional[str]) -> bool:
+        if self.client is None:
+            await self.start()
+
+        size = await asyncio.to_thread(os.path.getsize, path)
+        headers = {
+            "Content-Length": str(size),
+            "Content-Type": CONTENT_TYPES.get(
+                filename.rsplit(".", 1)[-1], "application/octet-stream"
+            ),
+        }
+        if digest:
+            headers["x-amz-meta-sha256"] = digest
+
+        async def body() -> AsyncIterator[bytes]:
+            f = await asyncio.to_thread(open, path, "rb")
+            try:
+                while chunk := await asyncio.to_thread(f.read, TTS_STREAM_CHUNK_BYTES):
+                    yield chunk
+            finally:
+                await asyncio.to_thread(f.close)
+
+        url = self._object_url(filename)
+        try:
+            # An explicit Content-Length keeps httpx from using chunked
+            # encoding, which S3 doesn't accept for unsigned payloads
+            response = await self.client.put(
+                url, content=body(), headers=self._signed("PUT", url, headers)
+            )
+            if response.status_code != 200:
+                raise httpx.HTTPError(f"{response.status_code} - {response.text[:200]}")
+            metrics.increment("audio_store_uploads")
+            return True
+        except httpx.HTTPError as e:
+            metrics.increment("audio_store_upload_failures")
+            logger.error(f"Failed to upload {filename} to audio store: {str(e)}")
+            return False
+
+    async def download(self, filename: str, path: str) -> Optional[str]:
+        if self.client is None:
+            await self.start()
+
+        url = self._object_url(filename)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            async with self.client.stream(
+                "GET", url, headers=self._signed("GET", url, {})
+            ) as response:
+                if response.status_code == 404:
+                    metrics.increment("audio_store_misses")
+                    return None
+                if response.status_code != 200:
+                    await response.aread()
+                    raise httpx.HTTPError(
+                        f"{response.status_code} - {response.text[:200]}"
+                    )
+
+                f = await asyncio.to_thread(open, tmp_path, "wb")
+                try:
+                    async for chunk in response.aiter_bytes(TTS_STREAM_CHUNK_BYTES):
+                        await asyncio.to_thread(f.write, chunk)
+                finally:
+                    await asyncio.to_thread(f.close)
+                await asyncio.to_thread(os.replace, tmp_path, path)
+                metrics.increment("audio_store_hits")
+                return response.headers.get("x-amz-meta-sha256", "")
+        except (httpx.HTTPError, OSError) as e:
+            metrics.increment("audio_store_download_failures")
+            logger.error(f"Failed to download {filename} from audio store: {str(e)}")
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            return None
+
+
+AUDIO_STORES = {
+    LocalAudioStore.name: LocalAudioStore,
+    S3AudioStore.name: S3AudioStore,
+}
+
+
+def create_audio_store(name: str) -> AudioStore:
+    """Instantiate the audio store configured by name"""
+    if name not in AUDIO_STORES:
+        raise ValueError(
+            f"Unknown audio store '{name}'. "
+            f"Available stores: {', '.join(AUDIO_STORES)}"
+        )
+    return AUDIO_STORES[name]()
+
+
+audio_store = create_audio_store(AUDIO_STORE)
@@ -0,0 +1,162 @@
+import time
+import heapq
+import asyncio
+import logging
+from typing import Dict, List, Optional
+from config import TWILIO_CPS, TWILIO_CPS_BURST, TWILIO_NUMBER_CPS
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class PacingDelayError(Exception):
+    """Raised when a call's next CPS slot is further away than it may wait"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Next CPS slot is {retry_after:.1f}s away")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Token bucket for one CPS limit, kept as a virtual schedule (GCRA)
+
+    Rather than counting tokens, remembers when the bucket will next be full
+    enough to allow a call at the steady rate. Up to burst calls may go out
+    back to back after an idle period.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.interval = 1 / rate
+        # How far ahead of the steady schedule a call may go
+        self.tolerance = (max(1, burst) - 1) * self.interval
+        self.next_slot = 0.0
+        # The latest call taken and the schedule before it, so it can be undone
+        self.last_taken: Optional[float] = None
+        self.previous_slot = 0.0
+
+    def earliest(self, now: float) -> float:
+        """Return the earliest time a call could be allowed"""
+        return max(now, self.next_slot - self.tolerance)
+
+    def take(self, at: float):
+        """Spend a token for a call going out at time at"""
+        self.last_taken, self.previous_slot = at, self.next_slot
+        self.next_slot = max(self.next_slot, at) + self.interval
+
+    def untake(self, at: float) -> bool:
+        """Refund the token for at if it was the latest one taken"""
+        if self.last_taken != at:
+            return False
+        self.next_slot, self.last_taken = self.previous_slot, None
+        return True
+
+
+class CallPacer:
+    """
+    Schedules outbound calls so they stay under Twilio's CPS limits
+
+    Every call takes a token from the account's bucket and, if its caller ID
+    has its own limit, from that number's bucket. A call reserves the first
+    slot both allow, in arrival order, then sleeps until that slot. Bursts
+    are therefore smoothed into a steady stream instead of being queued or
+    rejected by Twilio. A call cancelled before its slot gives the slot
+    back: the buckets are rewound if nothing was reserved after it,
+    otherwise the slot is handed to the next call from the same number.
+    """
+
+    def __init__(
+        self,
+        account_cps: float = TWILIO_CPS,
+        number_cps: Optional[Dict[str, float]] = None,
+        burst: int = TWILIO_CPS_BURST,
+    ):
+        self.burst = burst
+        self.account = TokenBucket(account_cps, burst) if account_cps > 0 else None
+        self.numbers = {
+            number: TokenBucket(cps, burst)
+            for number, cps in (number_cps or {}).items()
+            if cps > 0
+        }
+        self.waiting = 0
+        # Future slots given back by cancelled calls, per caller ID
+        self.released: Dict[str, List[float]] = {}
+
+    def _buckets(self, from_number: str) -> List[TokenBucket]:
+        return [
+            bucket
+            for bucket in (self.account, self.numbers.get(from_number))
+            if bucket is not None
+        ]
+
+    def _reuse(self, from_number: str, now: float, max_wait: Optional[float]):
+        """Pop a released slot for from_number that is still ahead, if any"""
+        released = self.released.get(from_number)
+        while released and released[0] < now:
+            heapq.heappop(released)
+        if released and (max_wait is None or released[0] - now <= max_wait):
+            slot = heapq.heappop(released)
+        else:
+            slot = None
+        if not released:
+            self.released.pop(from_number, None)
+        return slot
+
+    def reserve(self, from_number: str, max_wait: Optional[float] = None) -> float:
+        """
+        Reserve the next slot for a call from from_number; return its time
+
+        Raises PacingDelayError, without reserving anything, if the slot is
+        more than max_wait seconds away.
+        """
+        now = time.monotonic()
+        slot = self._reuse(from_number, now, max_wait)
+        if slot is not None:
+            return slot
+        buckets = self._buckets(from_number)
+        slot = max([now] + [bucket.earliest(now) for bucket in buckets])
+        if max_wait is not None and slot - now > max_wait:
+            raise PacingDelayError(slot - now)
+        for bucket in buckets:
+            bucket.take(slot)
+        return slot
+
+    def release(self, from_number: str, slot: float):
+        """Give back a reserved slot whose call will not be placed"""
+        buckets = self._buckets(from_number)
+        if all(bucket.last_taken == slot for bucket in buckets):
+            for bucket in buckets:
+                bucket.untake(slot)
+        elif slot > time.monotonic():
+            heapq.heappush(self.released.setdefault(from_number, []), slot)
+
+    async def wait_for_slot(self, from_number: str, max_wait: Optional[float] = None):
+        """
+        Wait until a call from from_number may be placed
+
+        Raises PacingDelayError if that is more than max_wait seconds away,
+        and releases the slot if cancelled while waiting for it.
+        Records how long the call waited for its slot (twilio_cps_wait_ms)
+        and how late it was released compared to the slot
+        (twilio_cps_lag_ms), which shows event loop or scheduler overload.
+        """
+        requested = time.monotonic()
+        slot = self.reserve(from_number, max_wait)
+        if slot > requested:
+            self.waiting += 1
+            metrics.set_gauge("twilio_cps_waiting", self.waiting)
+            try:
+                await asyncio.sleep(slot - requested)
+            except asyncio.CancelledError:
+                self.release(from_number, slot)
+                raise
+            finally:
+                self.waiting -= 1
+                metrics.set_gauge("twilio_cps_waiting", self.waiting)
+        released = time.monotonic()
+        metrics.observe("twilio_cps_wait_ms", (slot - requested) * 1000)
+        metrics.observe("twilio_cps_lag_ms", (released - slot) * 1000)
+
+
+call_pacer = CallPacer(TWILIO_CPS, TWILIO_NUMBER_CPS, TWILIO_CPS_BURST)
@@ -0,0 +1,824 @@
+import json
+import time
+import uuid
+import random
+import sqlite3
+import asyncio
+import logging
+import aiohttp
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from twilio.base.exceptions import TwilioRestException
+from config import (
+    CALL_QUEUE_BACKEND,
+    CALL_QUEUE_SQLITE_PATH,
+    CALL_QUEUE_REDIS_URL,
+    CALL_QUEUE_WORKERS,
+    CALL_QUEUE_MAX_ATTEMPTS,
+    CALL_QUEUE_RETRY_BASE_SECONDS,
+    CALL_QUEUE_RETRY_MAX_SECONDS,
+    CALL_QUEUE_LEASE_SECONDS,
+    CALL_QUEUE_POLL_SECONDS,
+    CALL_QUEUE_RETENTION_SECONDS,
+)
+from utils import metrics
+from utils.sqlite_db import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+# Job lifecycle
+JOB_QUEUED = "queued"  # waiting for a worker, or for its retry delay
+JOB_RUNNING = "running"  # claimed by a worker until its lease runs out
+JOB_COMPLETED = "completed"  # Twilio accepted the call
+JOB_FAILED = "failed"  # permanent error, or out of attempts
+# The request to place the call was sent but never answered, so the call may
+# or may not have gone out; never retried, so nobody is called twice
+JOB_UNKNOWN = "unknown"
+
+# How often queue depth, age and throughput gauges are refreshed
+STATS_INTERVAL_SECONDS = 5
+
+
+class JobDeferredError(Exception):
+    """Raised by a job handler to hand its job back until delay seconds from now"""
+
+    def __init__(self, delay: float, reason: str):
+        super().__init__(reason)
+        self.delay = delay
+
+
+class JobOutcomeUnknownError(Exception):
+    """Raised by a job handler when its side effect may or may not have happened"""
+
+
+class LeaseLostError(Exception):
+    """Raised when a worker finds its job was claimed by another worker"""
+
+
+class CallQueue:
+    """
+    Base class for the durable queue of outbound call jobs
+
+    A job's payload is whatever the enqueuer needs to place the call later.
+    Workers claim due jobs for CALL_QUEUE_LEASE_SECONDS and renew the lease
+    while they work on them; a job whose worker died mid-call is claimed
+    again once the lease runs out, so delivery is at least once. Every claim
+    gets a new lease token, and a job is only renewed, finished or put back
+    by the holder of its current token.
+    """
+
+    name = "base"
+
+    def __init__(self, lease_seconds: float = CALL_QUEUE_LEASE_SECONDS):
+        self.lease_seconds = lease_seconds
+        # Set on enqueue so idle workers in this process don't wait a poll
+        self.wakeup = asyncio.Event()
+
+    async def start(self):
+        """Open connections and create schema"""
+
+    async def close(self):
+        """Release connections"""
+
+    async def enqueue(self, payload: Dict[str, Any]) -> str:
+        """Persist a new job and return its ID"""
+        job_id = str(uuid.uuid4())
+        await self._add(job_id, payload, time.time())
+        metrics.increment("call_queue_enqueued")
+        self.wakeup.set()
+        return job_id
+
+    async def _add(self, job_id: str, payload: Dict[str, Any], now: float):
+        raise NotImplementedError
+
+    async def claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Lease the next due job to the caller, or return None if none is due
+
+        The job's "lease" is the token the caller passes to renew, complete,
+        retry or fail it.
+        """
+        raise NotImplementedError
+
+    async def renew(self, job_id: str, lease: str, sending: bool = False) -> bool:
+        """
+        Extend a job's lease; False if the caller no longer holds it
+
+        With sending, also records that the job's call is being placed, so a
+        worker that claims it after this one died won't place it again.
+        """
+        raise NotImplementedError
+
+    async def complete(self, job_id: str, lease: str, call_sid: str) -> bool:
+        """Mark a job done with the SID of the call it placed"""
+        raise NotImplementedError
+
+    async def retry(self, job_id: str, lease: str, delay: float, error: str) -> bool:
+        """Put a job back in the queue, due again after delay seconds"""
+        raise NotImplementedError
+
+    async def fail(
+        self, job_id: str, lease: str, error: str, status: str = JOB_FAILED
+    ) -> bool:
+        """Mark a job as permanently failed (or as JOB_UNKNOWN)"""
+        raise NotImplementedError
+
+    async def defer(self, job_id: str, lease: str, delay: float) -> bool:
+        """Put a job back in the queue for delay seconds without using an attempt"""
+        raise NotImplementedError
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job, or None if unknown or purged"""
+        raise NotImplementedError
+
+    async def stats(self) -> Dict[str, float]:
+        """Return the queued and running job counts and the oldest job's age"""
+        raise NotImplementedError
+
+    async def purge(self) -> int:
+        """Drop finished jobs past the retention period; return how many"""
+        return 0
+
+
+class SQLiteCallQueue(CallQueue):
+    """
+    Call jobs in a local SQLite database in WAL mode
+
+    Survives restarts and is shared by the workers of a single node. Claiming
+    is a single UPDATE ... RETURNING, so two processes never get the same
+    job.
+    """
+
+    name = "sqlite"
+
+    def __init__(
+        self,
+        lease_seconds: float = CALL_QUEUE_LEASE_SECONDS,
+        path: str = CALL_QUEUE_SQLITE_PATH,
+    ):
+        super().__init__(lease_seconds)
+        self.db = SQLiteDatabase(path, self._create_schema, "call queue")
+
+    @staticmethod
+    def _create_schema(connection: sqlite3.Connection):
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS call_jobs ("
+            "job_id TEXT PRIMARY KEY, status TEXT NOT NULL, "
+            "payload TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL, "
+            # When a queued job is due, or a running job's lease runs out
+            "next_attempt_at REAL NOT NULL, call_sid TEXT, error TEXT, "
+            # Token of the claim currently holding a running job
+            "lease TEXT, "
+            # When the holder started placing the call, if it has
+            "sent_at REAL)"
+        )
+        # Databases created before these columns existed
+        columns = connection.execute("PRAGMA table_info(call_jobs)").fetchall()
+        names = {column[1] for column in columns}
+        if "lease" not in names:
+            connection.execute("ALTER TABLE call_jobs ADD COLUMN lease TEXT")
+        if "sent_at" not in names:
+            connection.execute("ALTER TABLE call_jobs ADD COLUMN sent_at REAL")
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS call_jobs_due "
+            "ON call_jobs (status, next_attempt_at)"
+        )
+
+    async def _query(self, query: str, params: Tuple = ()) -> list:
+        return await self.db.query(query, params)
+
+    async def start(self):
+        await self.db.open()
+
+    async def close(self):
+        await self.db.close()
+
+    async def _add(self, job_id: str, payload: Dict[str, Any], now: float):
+        await self._query(
+            "INSERT INTO call_jobs "
+            "(job_id, status, payload, created_at, updated_at, next_attempt_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, JOB_QUEUED, json.dumps(payload), now, now, now),
+        )
+
+    async def claim(self) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        lease = uuid.uuid4().hex
+        rows = await self._query(
+            "UPDATE call_jobs SET status = ?, attempts = attempts + 1, lease = ?, "
+            "updated_at = ?, next_attempt_at = ? WHERE job_id = ("
+            "SELECT job_id FROM call_jobs WHERE status IN (?, ?) "
+            "AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT 1) "
+            "RETURNING job_id, payload, attempts, created_at, sent_at",
+            (
+                JOB_RUNNING,
+                lease,
+                now,
+                now + self.lease_seconds,
+                JOB_QUEUED,
+                JOB_RUNNING,
+                now,
+            ),
+        )
+        if not rows:
+            return None
+        job_id, payload, attempts, created_at, sent_at = rows[0]
+        return {
+            "job_id": job_id,
+            "status": JOB_RUNNING,
+            "payload": json.loads(payload),
+            "attempts": attempts,
+            "created_at": created_at,
+            "lease": lease,
+            "sent_at": sent_at,
+        }
+
+    async def _update_leased(
+        self, job_id: str, lease: str, assignments: str, params: Tuple
+    ) -> bool:
+        """Apply an UPDATE to a job only if lease still holds it"""
+        rows = await self._query(
+            f"UPDATE call_jobs SET {assignments} "
+            "WHERE job_id = ? AND lease = ? AND status = ? RETURNING job_id",
+            params + (job_id, lease, JOB_RUNNING),
+        )
+        return bool(rows)
+
+    async def renew(self, job_id: str, lease: str, sending: bool = False) -> bool:
+        now = time.time()
+        if sending:
+            return await self._update_leased(
+                job_id,
+                lease,
+                "next_attempt_at = ?, sent_at = ?",
+                (now + self.lease_seconds, now),
+            )
+        return await self._update_leased(
+            job_id, lease, "next_attempt_at = ?", (now + self.lease_seconds,)
+        )
+
+    async def complete(self, job_id: str, lease: str, call_sid: str) -> bool:
+        return await self._update_leased(
+            job_id,
+            lease,
+            "status = ?, call_sid = ?, error = NULL, lease = NULL, updated_at = ?",
+            (JOB_COMPLETED, call_sid, time.time()),
+        )
+
+    async def retry(self, job_id: str, lease: str, delay: float, error: str) -> bool:
+        now = time.time()
+        return await self._update_leased(
+            job_id,
+            lease,
+            "status = ?, error = ?, lease = NULL, sent_at = NULL, updated_at = ?, "
+            "next_attempt_at = ?",
+            (JOB_QUEUED, error, now, now + delay),
+        )
+
+    async def fail(
+        self, job_id: str, lease: str, error: str, status: str = JOB_FAILED
+    ) -> bool:
+        return await self._update_leased(
+            job_id,
+            lease,
+            "status = ?, error = ?, lease = NULL, updated_at = ?",
+            (status, error, time.time()),
+        )
+
+    async def defer(self, job_id: str, lease: str, delay: float) -> bool:
+        now = time.time()
+        return await self._update_leased(
+            job_id,
+            lease,
+            "status = ?, attempts = attempts - 1, lease = NULL, sent_at = NULL, "
+            "updated_at = ?, next_attempt_at = ?",
+            (JOB_QUEUED, now, now + delay),
+        )
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = await self._query(
+            "SELECT status, payload, attempts, created_at, updated_at, "
+            "call_sid, error FROM call_jobs WHERE job_id = ?",
+            (job_id,),
+        )
+        if not rows:
+            return None
+        status, payload, attempts, created_at, updated_at, call_sid, error = rows[0]
+        return {
+            "job_id": job_id,
+            "status": status,
+            "payload": json.loads(payload),
+            "attempts": attempts,
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "call_sid": call_sid,
+            "error": error,
+        }
+
+    async def stats(self) -> Dict[str, float]:
+        rows = await self._query(
+            "SELECT status, COUNT(*), MIN(created_at) FROM call_jobs "
+            "WHERE status IN (?, ?) GROUP BY status",
+            (JOB_QUEUED, JOB_RUNNING),
+        )
+        counts = {status: count for status, count, _ in rows}
+        oldest = min((created_at for _, _, created_at in rows), default=None)
+        return {
+            "queued": counts.get(JOB_QUEUED, 0),
+            "running": counts.get(JOB_RUNNING, 0),
+            "oldest_age_seconds": time.time() - oldest if oldest else 0.0,
+        }
+
+    async def purge(self) -> int:
+        rows = await self._query(
+            "DELETE FROM call_jobs WHERE status IN (?, ?, ?) AND updated_at < ? "
+            "RETURNING job_id",
+            (
+                JOB_COMPLETED,
+                JOB_FAILED,
+                JOB_UNKNOWN,
+                time.time() - CALL_QUEUE_RETENTION_SECONDS,
+            ),
+        )
+        return len(rows)
+
+
+class RedisCallQueue(CallQueue):
+    """
+    Call jobs in Redis, shared by every worker and replica
+
+    Each job is a hash; a sorted set orders pending jobs by when they are
+    next due (or their lease runs out), another by creation time for the age
+    metric, and a set holds the running ones. Finished jobs expire after
+    CALL_QUEUE_RETENTION_SECONDS.
+    Requires the optional redis package (pip install "redis>=5").
+    """
+
+    name = "redis"
+    key_prefix = "call_job:"
+    due_key = "call_jobs:due"
+    created_key = "call_jobs:created"
+    running_key = "call_jobs:running"
+
+    # Lease the earliest due job atomically
+    CLAIM_SCRIPT = """
+    local job_id = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 1)[1]
+    if not job_id then
+        return nil
+    end
+    redis.call('ZADD', KEYS[1], ARGV[2], job_id)
+    redis.call('SADD', KEYS[2], job_id)
+    local key = ARGV[3] .. job_id
+    redis.call('HSET', key, 'status', ARGV[4], 'updated_at', ARGV[1], 'lease', ARGV[5])
+    redis.call('HINCRBY', key, 'attempts', 1)
+    return job_id
+    """
+
+    # Push a leased job's due time (its lease expiry, or its retry time) back,
+    # adjust its attempts and update its fields, if the caller still holds
+    # the lease. A job handed back to the queue leaves the running set.
+    REQUEUE_SCRIPT = """
+    if redis.call('HGET', KEYS[2], 'lease') ~= ARGV[1] then
+        return 0
+    end
+    redis.call('ZADD', KEYS[1], ARGV[3], ARGV[2])
+    redis.call('HINCRBY', KEYS[2], 'attempts', ARGV[4])
+    if #ARGV > 5 then
+        redis.call('HSET', KEYS[2], unpack(ARGV, 6))
+    end
+    if redis.call('HGET', KEYS[2], 'status') ~= ARGV[5] then
+        redis.call('SREM', KEYS[3], ARGV[2])
+    end
+    return 1
+    """
+
+    # Finish a leased job, if the caller still holds the lease
+    FINISH_SCRIPT = """
+    if redis.call('HGET', KEYS[3], 'lease') ~= ARGV[1] then
+        return 0
+    end
+    redis.call('ZREM', KEYS[1], ARGV[2])
+    redis.call('ZREM', KEYS[2], ARGV[2])
+    redis.call('SREM', KEYS[4], ARGV[2])
+    redis.call('HSET', KEYS[3], unpack(ARGV, 4))
+    redis.call('EXPIRE', KEYS[3], ARGV[3])
+    return 1
+    """
+
+    def __init__(
+        self,
+        lease_seconds: float = CALL_QUEUE_LEASE_SECONDS,
+        url: str = CALL_QUEUE_REDIS_URL,
+    ):
+        super().__init__(lease_seconds)
+        self.url = url
+        self.client = None
+
+    async def start(self):
+        if self.client is not None:
+            return
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError(
+                'CALL_QUEUE_BACKEND=redis needs the redis package (pip install "redis>=5")'
+            )
+        self.client = redis.Redis.from_url(self.url, decode_responses=True)
+        await self.client.ping()
+        logger.info(f"Redis call queue connected to {self.url}")
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def _add(self, job_id: str, payload: Dict[str, Any], now: float):
+        if self.client is None:
+            await self.start()
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(
+                self.key_prefix + job_id,
+                mapping={
+                    "status": JOB_QUEUED,
+                    "payload": json.dumps(payload),
+                    "attempts": 0,
+                    "created_at": now,
+                    "updated_at": now,
+                },
+            )
+            pipe.zadd(self.due_key, {job_id: now})
+            pipe.zadd(self.created_key, {job_id: now})
+            await pipe.execute()
+
+    async def claim(self) -> Optional[Dict[str, Any]]:
+        if self.client is None:
+            await self.start()
+        now = time.time()
+        lease = uuid.uuid4().hex
+        job_id = await self.client.eval(
+            self.CLAIM_SCRIPT,
+            2,
+            self.due_key,
+            self.running_key,
+            now,
+            now + self.lease_seconds,
+            self.key_prefix,
+            JOB_RUNNING,
+            lease,
+        )
+        if not job_id:
+            return None
+        job = await self.get(job_id)
+        if job is not None:
+            sent_at = await self.client.hget(self.key_prefix + job_id, "sent_at")
+            job["lease"] = lease
+            job["sent_at"] = float(sent_at) if sent_at else None
+        return job
+
+    async def _requeue(
+        self, job_id: str, lease: str, due: float, attempts: int, *fields
+    ) -> bool:
+        if self.client is None:
+            await self.start()
+        return bool(
+            await self.client.eval(
+                self.REQUEUE_SCRIPT,
+                3,
+                self.due_key,
+                self.key_prefix + job_id,
+                self.running_key,
+                lease,
+                job_id,
+                due,
+                attempts,
+                JOB_RUNNING,
+                *fields,
+            )
+        )
+
+    async def _finish(self, job_id: str, lease: str, *fields) -> bool:
+        if self.client is None:
+            await self.start()
+        return bool(
+            await self.client.eval(
+                self.FINISH_SCRIPT,
+                4,
+                self.due_key,
+                self.created_key,
+                self.key_prefix + job_id,
+                self.running_key,
+                lease,
+                job_id,
+                CALL_QUEUE_RETENTION_SECONDS,
+                "updated_at",
+                time.time(),
+                "lease",
+                "",
+                *fields,
+            )
+        )
+
+    async def renew(self, job_id: str, lease: str, sending: bool = False) -> bool:
+        now = time.time()
+        fields = ("sent_at", now) if sending else ()
+        return await self._requeue(job_id, lease, now + self.lease_seconds, 0, *fields)
+
+    async def complete(self, job_id: str, lease: str, call_sid: str) -> bool:
+        return await self._finish(
+            job_id,
+            lease,
+            "status",
+            JOB_COMPLETED,
+            "call_sid",
+            call_sid,
+            "error",
+            "",
+        )
+
+    async def retry(self, job_id: str, lease: str, delay: float, error: str) -> bool:
+        now = time.time()
+        return await self._requeue(
+            job_id,
+            lease,
+            now + delay,
+            0,
+            "status",
+            JOB_QUEUED,
+            "error",
+            error,
+            "updated_at",
+            now,
+            "lease",
+            "",
+            "sent_at",
+            "",
+        )
+
+    async def fail(
+        self, job_id: str, lease: str, error: str, status: str = JOB_FAILED
+    ) -> bool:
+        return await self._finish(job_id, lease, "status", status, "error", error)
+
+    async def defer(self, job_id: str, lease: str, delay: float) -> bool:
+        now = time.time()
+        return await self._requeue(
+            job_id,
+            lease,
+            now + delay,
+            -1,
+            "status",
+            JOB_QUEUED,
+            "updated_at",
+            now,
+            "lease",
+            "",
+            "sent_at",
+            "",
+        )
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        if self.client is None:
+            await self.start()
+        fields = await self.client.hgetall(self.key_prefix + job_id)
+        if not fields:
+            return None
+        return {
+            "job_id": job_id,
+            "status": fields["status"],
+            "payload": json.loads(fields["payload"]),
+            "attempts": int(fields["attempts"]),
+            "created_at": float(fields["created_at"]),
+            "updated_at": float(fields["updated_at"]),
+            "call_sid": fields.get("call_sid") or None,
+            "error": fields.get("error") or None,
+        }
+
+    async def stats(self) -> Dict[str, float]:
+        if self.client is None:
+            await self.start()
+        now = time.time()
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.zcard(self.created_key)
+            pipe.scard(self.running_key)
+            pipe.zrange(self.created_key, 0, 0, withscores=True)
+            pending, running, oldest = await pipe.execute()
+        # Jobs waiting for a retry are queued, as in the SQLite backend
+        return {
+            "queued": pending - running,
+            "running": running,
+            "oldest_age_seconds": now - oldest[0][1] if oldest else 0.0,
+        }
+
+
+CALL_QUEUES = {
+    SQLiteCallQueue.name: SQLiteCallQueue,
+    RedisCallQueue.name: RedisCallQueue,
+}
+
+
+def create_call_queue(name: str) -> CallQueue:
+    """Instantiate the call queue backend configured by name"""
+    if name not in CALL_QUEUES:
+        raise ValueError(
+            f"Unknown call queue backend '{name}'. "
+            f"Available backends: {', '.join(CALL_QUEUES)}"
+        )
+    return CALL_QUEUES[name]()
+
+
+call_queue = create_call_queue(CALL_QUEUE_BACKEND)
+
+
+def is_transient_error(error: Exception) -> bool:
+    """
+    Whether placing a call might succeed if retried later
+
+    Only errors that show the call wasn't placed are retried: Twilio refusing
+    the request (rate limited, or unavailable), or no connection at all.
+    """
+    if isinstance(error, TwilioRestException):
+        return error.status in (429, 503)
+    return isinstance(
+        error, (aiohttp.ClientConnectorError, aiohttp.ConnectionTimeoutError)
+    )
+
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter, so retries don't arrive in waves"""
+    return random.uniform(
+        0,
+        min(
+            CALL_QUEUE_RETRY_MAX_SECONDS,
+            CALL_QUEUE_RETRY_BASE_SECONDS * 2 ** (attempt - 1),
+        ),
+    )
+
+
+async def _hold_lease(job: Dict[str, Any], handler: "asyncio.Task[str]"):
+    """
+    Renew a job's lease while its handler runs
+
+    Renews every third of the lease. If the lease was taken over, or can't
+    be renewed before it runs out, the handler is cancelled so the job isn't
+    worked on twice, unless it is already placing the call (see mark_sending).
+    """
+    interval = call_queue.lease_seconds / 3
+    expires = time.monotonic() + call_queue.lease_seconds
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if await call_queue.renew(job["job_id"], job["lease"]):
+                expires = time.monotonic() + call_queue.lease_seconds
+                continue
+            reason = "it was claimed again"
+        except Exception as e:
+            if time.monotonic() + interval < expires:
+                logger.warning(f"Could not renew call job lease: {str(e)}")
+                continue
+            reason = f"it couldn't be renewed: {str(e)}"
+        metrics.increment("call_queue_lease_lost")
+        logger.error(f"Call job {job['job_id']} lost its lease, {reason}")
+        if not job.get("sent_at"):
+            handler.cancel()
+        return
+
+
+async def mark_sending(job: Dict[str, Any]):
+    """
+    Record that a job's call is about to be placed
+
+    Called by the handler right before the request leaves. Renews the lease,
+    so the request has a full lease to complete in, and marks the job so it
+    is never placed again if this worker dies or is cancelled from here on.
+    Raises LeaseLostError if the job was claimed by another worker.
+    """
+    if not await call_queue.renew(job["job_id"], job["lease"], sending=True):
+        raise LeaseLostError(f"Call job {job['job_id']} was claimed again")
+    job["sent_at"] = time.time()
+
+
+async def _run_job(job: Dict[str, Any], run_job: Callable[[Dict], Awaitable[str]]):
+    job_id, lease = job["job_id"], job["lease"]
+    if job["attempts"] == 1:
+        metrics.observe("call_queue_wait_ms", (time.time() - job["created_at"]) * 1000)
+    if job["sent_at"]:
+        # Its last worker stopped while placing the call, which may have gone out
+        metrics.increment("call_queue_unknown")
+        await call_queue.fail(
+            job_id, lease, "Worker stopped while placing the call", JOB_UNKNOWN
+        )
+        return
+    if job["attempts"] > CALL_QUEUE_MAX_ATTEMPTS:
+        # Its last worker died holding the lease
+        metrics.increment("call_queue_failed")
+        await call_queue.fail(job_id, lease, "Out of attempts")
+        return
+
+    handler = asyncio.create_task(run_job(job))
+    heartbeat = asyncio.create_task(_hold_lease(job, handler))
+    try:
+        call_sid = await handler
+    except asyncio.CancelledError:
+        if heartbeat.done() and not asyncio.current_task().cancelling():
+            # Cancelled by the heartbeat; the job's new holder takes over
+            return
+        raise
+    except LeaseLostError as e:
+        metrics.increment("call_queue_lease_lost")
+        logger.error(str(e))
+        return
+    except JobOutcomeUnknownError as e:
+        logger.error(f"Call job {job_id} may or may not have placed its call: {str(e)}")
+        if await call_queue.fail(job_id, lease, str(e), JOB_UNKNOWN):
+            metrics.increment("call_queue_unknown")
+        return
+    except JobDeferredError as e:
+        logger.info(f"Call job {job_id} deferred for {e.delay:.1f}s: {str(e)}")
+        if await call_queue.defer(job_id, lease, e.delay):
+            metrics.increment("call_queue_deferred")
+        return
+    except Exception as e:
+        if is_transient_error(e) and job["attempts"] < CALL_QUEUE_MAX_ATTEMPTS:
+            delay = retry_delay(job["attempts"])
+            logger.warning(
+                f"Call job {job_id} attempt {job['attempts']} failed, "
+                f"retrying in {delay:.1f}s: {str(e)}"
+            )
+            if await call_queue.retry(job_id, lease, delay, str(e)):
+                metrics.increment("call_queue_retries")
+        else:
+            logger.error(f"Call job {job_id} failed: {str(e)}")
+            if await call_queue.fail(job_id, lease, str(e)):
+                metrics.increment("call_queue_failed")
+        return
+    finally:
+        heartbeat.cancel()
+
+    if await call_queue.complete(job_id, lease, call_sid):
+        metrics.increment("call_queue_completed")
+    else:
+        metrics.increment("call_queue_lease_lost")
+        logger.error(f"Call job {job_id} placed {call_sid} after losing its lease")
+
+
+async def _work(run_job: Callable[[Dict], Awaitable[str]]):
+    while True:
+        try:
+            # Cleared before claiming so an enqueue in between isn't missed
+            call_queue.wakeup.clear()
+            job = await call_queue.claim()
+            if job is None:
+                # Not wait_for: on 3.11 it can swallow a cancellation that
+                # arrives just as the event is set, and shutdown would hang
+                try:
+                    async with asyncio.timeout(CALL_QUEUE_POLL_SECONDS):
+                        await call_queue.wakeup.wait()
+                except TimeoutError:
+                    pass
+                continue
+            await _run_job(job, run_job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in call queue worker: {str(e)}")
+            await asyncio.sleep(CALL_QUEUE_POLL_SECONDS)
+
+
+async def run_call_queue(run_job: Callable[[Dict], Awaitable[str]]):
+    """
+    Drain the call queue with CALL_QUEUE_WORKERS workers
+
+    run_job places the call for a job and returns its SID; transient errors
+    it raises are retried with backoff, others fail the job. It may raise
+    JobDeferredError to hand the job back without using up an attempt, and
+    must call mark_sending right before placing the call. Jobs whose call
+    may or may not have been placed (JobOutcomeUnknownError, or a worker
+    that stopped after mark_sending) end as JOB_UNKNOWN and aren't retried. Also refreshes
+    the queue gauges (call_queue_queued, call_queue_running,
+    call_queue_oldest_age_seconds and call_queue_throughput, in jobs per
+    second) and purges old finished jobs.
+    """
+    workers = [asyncio.create_task(_work(run_job)) for _ in range(CALL_QUEUE_WORKERS)]
+    finished = metrics.counter("call_queue_completed")
+    try:
+        while True:
+            await asyncio.sleep(STATS_INTERVAL_SECONDS)
+            try:
+                stats = await call_queue.stats()
+                for name, value in stats.items():
+                    metrics.set_gauge(f"call_queue_{name}", value)
+                completed = metrics.counter("call_queue_completed")
+                metrics.set_gauge(
+                    "call_queue_throughput",
+                    (completed - finished) / STATS_INTERVAL_SECONDS,
+                )
+                finished = completed
+                purged = await call_queue.purge()
+                if purged:
+                    logger.info(f"Purged {purged} finished call jobs")
+            except Exception as e:
+                logger.error(f"Error refreshing call queue stats: {str(e)}")
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
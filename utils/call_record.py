@@ -0,0 +1,84 @@
+import time
+import asyncio
+from typing import Any, Dict, List, Optional
+from utils.message_templates import Segment
+
+# Call lifecycle as seen by this server
+CALL_DISPATCHED = "dispatched"  # handed to Twilio, waiting to be answered
+CALL_IN_PROGRESS = "in_progress"  # the voice webhook has run
+
+
+# Fields that only make sense inside this process
+LOCAL_FIELDS = ("audio_task", "expires_at")
+
+
+class CallRecord:
+    """
+    State of one dispatched call, kept until its webhooks are done
+
+    Uses __slots__ rather than a per-call dict since hundreds of thousands of
+    records can be live at once. audio_task is process-local and expires_at
+    belongs to the in-memory store, so neither is serialized.
+    """
+
+    __slots__ = (
+        "call_id",
+        "sms_body",
+        "from_number",
+        "to_number",
+        "source",
+        "segments",
+        "status",
+        "created_at",
+        "updated_at",
+        "audio_files",
+        "audio_task",
+        "expires_at",
+    )
+
+    def __init__(
+        self,
+        call_id: str,
+        sms_body: str,
+        from_number: str,
+        to_number: str,
+        source: str = "api_call",
+        segments: Optional[List[Segment]] = None,
+        status: str = CALL_DISPATCHED,
+        created_at: Optional[float] = None,
+        updated_at: Optional[float] = None,
+        audio_files: Optional[List[str]] = None,
+        audio_task: "Optional[asyncio.Task[Optional[List[Optional[str]]]]]" = None,
+    ):
+        self.call_id = call_id
+        self.sms_body = sms_body
+        self.from_number = from_number
+        self.to_number = to_number
+        self.source = source
+        self.segments = segments
+        self.status = status
+        self.created_at = created_at or time.time()
+        self.updated_at = updated_at or self.created_at
+        self.audio_files = audio_files
+        self.audio_task = audio_task
+        self.expires_at = 0.0
+
+    def set_status(self, status: str):
+        self.status = status
+        self.updated_at = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the serializable fields"""
+        return {
+            name: getattr(self, name)
+            for name in self.__slots__
+            if name not in LOCAL_FIELDS
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CallRecord":
+        """Rebuild a record from to_dict() output that went through JSON"""
+        data = dict(data)
+        if data.get("segments"):
+            data["segments"] = [Segment(*segment) for segment in data["segments"]]
+        return cls(**data)
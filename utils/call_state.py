@@ -0,0 +1,296 @@
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional, Tuple
+from config import (
+    CALL_STATE_BACKEND,
+    CALL_STATE_TTL_SECONDS,
+    CALL_STATE_MAX_ENTRIES,
+    CALL_STATE_SWEEP_INTERVAL_SECONDS,
+    CALL_STATE_SQLITE_PATH,
+    CALL_STATE_REDIS_URL,
+)
+from utils import metrics
+from utils.call_record import CallRecord
+from utils.sqlite_db import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+
+class CallStateStore:
+    """
+    Base class for where a dispatched call's data waits for its webhooks
+
+    Entries expire ttl_seconds after they were last written. Stores that
+    keep records as Python objects (keeps_objects) also keep their
+    process-local audio_task; the others serialize everything else.
+    """
+
+    name = "base"
+    keeps_objects = False
+
+    def __init__(self, ttl_seconds: float = CALL_STATE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+
+    async def start(self):
+        """Open connections and create schema"""
+
+    async def close(self):
+        """Release connections"""
+
+    async def get(self, call_id: str) -> Optional[CallRecord]:
+        """Return the record for a call, or None if unknown or expired"""
+        raise NotImplementedError
+
+    async def put(self, record: CallRecord, ttl: Optional[float] = None):
+        """Store a call's record, expiring after ttl (default ttl_seconds)"""
+        raise NotImplementedError
+
+    async def delete(self, call_id: str):
+        """Forget a call"""
+        raise NotImplementedError
+
+    async def sweep(self) -> int:
+        """Remove expired entries and return how many were removed"""
+        return 0
+
+    def local_records(self) -> Iterable[CallRecord]:
+        """Records held as objects in this process (see keeps_objects)"""
+        return ()
+
+
+class MemoryCallStateStore(CallStateStore):
+    """
+    Call state in a dict in this process
+
+    Holds at most max_entries calls; beyond that the least recently used
+    are evicted. Expired entries are removed when read or swept. Records are
+    stored as-is, so get() returns the stored record itself.
+    """
+
+    name = "memory"
+    keeps_objects = True
+
+    def __init__(
+        self,
+        ttl_seconds: float = CALL_STATE_TTL_SECONDS,
+        max_entries: int = CALL_STATE_MAX_ENTRIES,
+    ):
+        super().__init__(ttl_seconds)
+        self.max_entries = max_entries
+        # Expiry is kept on the record itself to save a tuple per call
+        self.entries: "OrderedDict[str, CallRecord]" = OrderedDict()
+
+    async def get(self, call_id: str) -> Optional[CallRecord]:
+        record = self.entries.get(call_id)
+        if record is None:
+            return None
+        if record.expires_at < time.time():
+            del self.entries[call_id]
+            metrics.increment("call_state_expired")
+            self._update_gauges()
+            return None
+        self.entries.move_to_end(call_id)
+        return record
+
+    async def put(self, record: CallRecord, ttl: Optional[float] = None):
+        self.entries.pop(record.call_id, None)
+        record.expires_at = time.time() + (ttl or self.ttl_seconds)
+        self.entries[record.call_id] = record
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            metrics.increment("call_state_evictions")
+        self._update_gauges()
+
+    async def delete(self, call_id: str):
+        self.entries.pop(call_id, None)
+        self._update_gauges()
+
+    async def sweep(self) -> int:
+        now = time.time()
+        expired = [
+            call_id
+            for call_id, record in self.entries.items()
+            if record.expires_at < now
+        ]
+        for call_id in expired:
+            del self.entries[call_id]
+        self._update_gauges()
+        return len(expired)
+
+    def local_records(self) -> Iterable[CallRecord]:
+        return list(self.entries.values())
+
+    def _update_gauges(self):
+        metrics.set_gauge("call_state_entries", len(self.entries))
+
+
+class SQLiteCallStateStore(CallStateStore):
+    """
+    Call state in a local SQLite database in WAL mode
+
+    Survives restarts and is shared by the workers of a single node.
+    """
+
+    name = "sqlite"
+
+    def __init__(
+        self,
+        ttl_seconds: float = CALL_STATE_TTL_SECONDS,
+        path: str = CALL_STATE_SQLITE_PATH,
+    ):
+        super().__init__(ttl_seconds)
+        self.db = SQLiteDatabase(path, self._create_schema, "call state store")
+
+    @staticmethod
+    def _create_schema(connection: sqlite3.Connection):
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS call_state ("
+            "call_id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS call_state_expires_at "
+            "ON call_state (expires_at)"
+        )
+
+    async def start(self):
+        await self.db.open()
+
+    async def close(self):
+        await self.db.close()
+
+    async def get(self, call_id: str) -> Optional[CallRecord]:
+        rows = await self.db.query(
+            "SELECT data FROM call_state WHERE call_id = ? AND expires_at > ?",
+            (call_id, time.time()),
+        )
+        return CallRecord.from_dict(json.loads(rows[0][0])) if rows else None
+
+    async def put(self, record: CallRecord, ttl: Optional[float] = None):
+        await self.db.query(
+            "INSERT OR REPLACE INTO call_state (call_id, data, expires_at) "
+            "VALUES (?, ?, ?)",
+            (
+                record.call_id,
+                json.dumps(record.to_dict()),
+                time.time() + (ttl or self.ttl_seconds),
+            ),
+        )
+
+    async def delete(self, call_id: str):
+        await self.db.query("DELETE FROM call_state WHERE call_id = ?", (call_id,))
+
+    async def sweep(self) -> int:
+        def sweep_expired(connection: sqlite3.Connection) -> Tuple[int, int]:
+            removed = connection.execute(
+                "DELETE FROM call_state WHERE expires_at <= ?", (time.time(),)
+            ).rowcount
+            live = connection.execute("SELECT COUNT(*) FROM call_state").fetchone()[0]
+            return removed, live
+
+        removed, live = await self.db.transaction(sweep_expired)
+        metrics.set_gauge("call_state_entries", live)
+        return removed
+
+
+class RedisCallStateStore(CallStateStore):
+    """
+    Call state in Redis, shared by every worker and replica
+
+    Expiry is handled by Redis itself (SET ... EX), so sweeping is a no-op.
+    Requires the optional redis package (pip install "redis>=5").
+    """
+
+    name = "redis"
+    key_prefix = "call_state:"
+
+    def __init__(
+        self,
+        ttl_seconds: float = CALL_STATE_TTL_SECONDS,
+        url: str = CALL_STATE_REDIS_URL,
+    ):
+        super().__init__(ttl_seconds)
+        self.url = url
+        self.client = None
+
+    async def start(self):
+        if self.client is not None:
+            return
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError(
+                'CALL_STATE_BACKEND=redis needs the redis package (pip install "redis>=5")'
+            )
+        self.client = redis.Redis.from_url(self.url)
+        await self.client.ping()
+        logger.info(f"Redis call state store connected to {self.url}")
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def get(self, call_id: str) -> Optional[CallRecord]:
+        if self.client is None:
+            await self.start()
+        value = await self.client.get(self.key_prefix + call_id)
+        return CallRecord.from_dict(json.loads(value)) if value is not None else None
+
+    async def put(self, record: CallRecord, ttl: Optional[float] = None):
+        if self.client is None:
+            await self.start()
+        await self.client.set(
+            self.key_prefix + record.call_id,
+            json.dumps(record.to_dict()),
+            ex=max(1, int(ttl or self.ttl_seconds)),
+        )
+
+    async def delete(self, call_id: str):
+        if self.client is None:
+            await self.start()
+        await self.client.delete(self.key_prefix + call_id)
+
+
+CALL_STATE_STORES = {
+    MemoryCallStateStore.name: MemoryCallStateStore,
+    SQLiteCallStateStore.name: SQLiteCallStateStore,
+    RedisCallStateStore.name: RedisCallStateStore,
+}
+
+
+def create_call_state_store(name: str) -> CallStateStore:
+    """Instantiate the call state backend configured by name"""
+    if name not in CALL_STATE_STORES:
+        raise ValueError(
+            f"Unknown call state backend '{name}'. "
+            f"Available backends: {', '.join(CALL_STATE_STORES)}"
+        )
+    return CALL_STATE_STORES[name]()
+
+
+call_state_store = create_call_state_store(CALL_STATE_BACKEND)
+
+
+async def run_call_state_sweeper(on_sweep: Optional[Callable[[], None]] = None):
+    """
+    Drop expired call state every CALL_STATE_SWEEP_INTERVAL_SECONDS
+
+    Most calls never reach the IVR input step (voicemail, busy, no answer,
+    early hang-up), so their state is only ever removed by expiry. on_sweep
+    runs after each sweep to expire process-local state alongside.
+    """
+    while True:
+        await asyncio.sleep(CALL_STATE_SWEEP_INTERVAL_SECONDS)
+        try:
+            removed = await call_state_store.sweep()
+            if on_sweep is not None:
+                on_sweep()
+            if removed:
+                metrics.increment("call_state_expired", removed)
+                logger.info(f"Call state sweep removed {removed} expired calls")
+        except Exception as e:
+            logger.error(f"Error sweeping call state: {str(e)}")
@@ -0,0 +1,98 @@
+import hmac
+import json
+import time
+import zlib
+import base64
+import hashlib
+from typing import Any, Dict
+from config import CALL_TOKEN_SECRET, CALL_TOKEN_TTL_SECONDS, CALL_TOKEN_COMPRESS
+
+# Short names for the call record fields that travel in a token
+TOKEN_FIELDS = {
+    "call_id": "i",
+    "sms_body": "b",
+    "from_number": "f",
+    "to_number": "t",
+    "source": "s",
+    "segments": "g",
+}
+EXPIRY_FIELD = "x"
+
+# First byte of the signed data says how the body is encoded
+PLAIN = b"j"
+COMPRESSED = b"z"
+
+# Truncated HMAC-SHA256; 128 bits is plenty for a short-lived URL
+SIGNATURE_BYTES = 16
+
+
+class InvalidCallTokenError(ValueError):
+    """A call token is malformed, tampered with or expired"""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(data: bytes) -> bytes:
+    return hmac.new(CALL_TOKEN_SECRET.encode(), data, hashlib.sha256).digest()[
+        :SIGNATURE_BYTES
+    ]
+
+
+def encode_call_token(call_data: Dict[str, Any]) -> str:
+    """
+    Pack a call's data into a compact, signed, URL-safe token
+
+    Only the fields in TOKEN_FIELDS are kept. The JSON body is zlib-compressed
+    when that makes it smaller (long messages); short messages stay plain.
+    """
+    payload = {
+        short: call_data[field]
+        for field, short in TOKEN_FIELDS.items()
+        if call_data.get(field) is not None
+    }
+    payload[EXPIRY_FIELD] = int(time.time()) + CALL_TOKEN_TTL_SECONDS
+    body = json.dumps(payload, separators=(",", ":")).encode()
+
+    data = PLAIN + body
+    if CALL_TOKEN_COMPRESS:
+        compressed = zlib.compress(body, 9)
+        if len(compressed) < len(body):
+            data = COMPRESSED + compressed
+    return f"{_b64encode(data)}.{_b64encode(_sign(data))}"
+
+
+def decode_call_token(token: str) -> Dict[str, Any]:
+    """
+    Verify a call token and return the call data it carries
+
+    Raises InvalidCallTokenError if the signature doesn't match or the token
+    has expired.
+    """
+    try:
+        encoded, signature = token.split(".")
+        data = _b64decode(encoded)
+        valid = hmac.compare_digest(_b64decode(signature), _sign(data))
+    except ValueError:
+        raise InvalidCallTokenError("Malformed call token")
+    if not valid:
+        raise InvalidCallTokenError("Call token signature mismatch")
+
+    try:
+        body = zlib.decompress(data[1:]) if data[:1] == COMPRESSED else data[1:]
+        payload = json.loads(body)
+    except (zlib.error, ValueError):
+        raise InvalidCallTokenError("Undecodable call token")
+    if payload.get(EXPIRY_FIELD, 0) < time.time():
+        raise InvalidCallTokenError("Call token expired")
+
+    return {
+        field: payload[short]
+        for field, short in TOKEN_FIELDS.items()
+        if short in payload
+    }
@@ -0,0 +1,156 @@
+import time
+import logging
+from collections import deque
+from typing import Any, Dict, Tuple
+from config import (
+    TTS_BREAKER_WINDOW,
+    TTS_BREAKER_MIN_REQUESTS,
+    TTS_BREAKER_FAILURE_RATE,
+    TTS_BREAKER_SLOW_MS,
+    TTS_BREAKER_OPEN_SECONDS,
+)
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker tracking the error rate and latency of an upstream
+
+    The breaker opens when the share of failed or slow requests among the
+    last window_size outcomes reaches failure_rate (once at least
+    min_requests have been seen). While open, requests are refused so callers
+    can fall back immediately. After open_seconds a single half-open probe
+    request is let through: success closes the breaker, failure re-opens it.
+    Only the probe's own outcome decides; requests admitted before the
+    breaker opened don't count once it has.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window_size: int,
+        min_requests: int,
+        failure_rate: float,
+        slow_call_ms: float,
+        open_seconds: float,
+    ):
+        self.name = name
+        self.min_requests = min_requests
+        self.failure_rate = failure_rate
+        self.slow_call_ms = slow_call_ms
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.outcomes: deque = deque(maxlen=window_size)
+        self._set_state(CLOSED)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning(f"Circuit breaker '{self.name}' {self.state} -> {state}")
+        self.state = state
+        metrics.set_gauge(f"{self.name}_circuit_state", STATE_VALUES[state])
+
+    def _open(self):
+        self._set_state(OPEN)
+        self.opened_at = time.monotonic()
+        self.probe_in_flight = False
+        metrics.increment(f"{self.name}_circuit_opened")
+
+    def is_open(self) -> bool:
+        """Whether requests are still being refused, without taking the probe"""
+        if self.state != OPEN:
+            return False
+        if time.monotonic() - self.opened_at < self.open_seconds:
+            metrics.increment(f"{self.name}_circuit_short_circuited")
+            return True
+        return False
+
+    def allow_request(self) -> Tuple[bool, bool]:
+        """
+        Return whether a request may go upstream right now, and whether it
+        is the half-open probe
+
+        The probe flag must be passed back with the request's outcome.
+        """
+        if self.state == CLOSED:
+            return True, False
+
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                metrics.increment(f"{self.name}_circuit_short_circuited")
+                return False, False
+            self._set_state(HALF_OPEN)
+
+        # Half-open: let exactly one probe through at a time
+        if self.probe_in_flight:
+            metrics.increment(f"{self.name}_circuit_short_circuited")
+            return False, False
+        self.probe_in_flight = True
+        metrics.increment(f"{self.name}_circuit_probes")
+        return True, True
+
+    def record_success(self, latency_ms: float, probe: bool = False):
+        """Record a completed request; slow requests count as failures"""
+        if latency_ms >= self.slow_call_ms:
+            metrics.increment(f"{self.name}_circuit_slow_calls")
+            self.record_failure(probe)
+            return
+
+        if probe:
+            self.outcomes.clear()
+            self.probe_in_flight = False
+            self._set_state(CLOSED)
+            return
+        if self.state == CLOSED:
+            self.outcomes.append(True)
+
+    def record_failure(self, probe: bool = False):
+        """Record a failed request and open the breaker if needed"""
+        if probe:
+            self._open()
+            return
+        if self.state != CLOSED:
+            # Admitted before the breaker opened; the probe decides now
+            return
+
+        self.outcomes.append(False)
+        failures = self.outcomes.count(False)
+        if (
+            len(self.outcomes) >= self.min_requests
+            and failures / len(self.outcomes) >= self.failure_rate
+        ):
+            self._open()
+
+    def release_probe(self):
+        """Free the probe slot if the probe ended without an outcome"""
+        self.probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the breaker state and recent failure rate"""
+        failures = self.outcomes.count(False)
+        return {
+            "state": self.state,
+            "recent_requests": len(self.outcomes),
+            "recent_failure_rate": (
+                failures / len(self.outcomes) if self.outcomes else 0.0
+            ),
+        }
+
+
+elevenlabs_breaker = CircuitBreaker(
+    "tts",
+    window_size=TTS_BREAKER_WINDOW,
+    min_requests=TTS_BREAKER_MIN_REQUESTS,
+    failure_rate=TTS_BREAKER_FAILURE_RATE,
+    slow_call_ms=TTS_BREAKER_SLOW_MS,
+    open_seconds=TTS_BREAKER_OPEN_SECONDS,
+)
@@ -1,68 +1,603 @@
 import os
+import re
+import time
+import fcntl
 import uuid
-import requests
+import asyncio
+import hashlib
+import httpx
 import logging
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from fastapi import Request
-from config import ELEVENLABS_API_KEY, AUDIO_DIR
+from config import (
+    AUDIO_DIR,
+    TTS_PROVIDER,
+    TTS_DEADLINE_MS,
+    TTS_CROSS_WORKER_LOCK,
+    TTS_CHUNKING,
+    TTS_CHUNK_MIN_CHARS,
+    TTS_CHUNK_CONCURRENCY,
+    TTS_CHUNK_WAIT_SECONDS,
+    ELEVENLABS_OUTPUT_FORMAT,
+)
+from utils import metrics
+from utils.audio_cache import audio_cache, cache_key
+from utils.audio_formats import get_audio_format, ulaw_wav_header
+from utils.audio_store import audio_store
+from utils.message_templates import Segment
+from utils.call_record import CallRecord
+from utils.circuit_breaker import elevenlabs_breaker
+from utils.tts_providers import TTSProvider, TTSProviderError, create_provider
+from utils.tts_scheduler import (
+    tts_scheduler,
+    QueueFullError,
+    PRIORITY_LIVE,
+    PRIORITY_PRESYNTH,
+)
 
 logger = logging.getLogger(__name__)
 
+# TTS backend (ElevenLabs, or the offline fake for load tests)
+provider: TTSProvider = create_provider(TTS_PROVIDER)
 
-async def generate_elevenlabs_audio(text: str, request: Request) -> Optional[str]:
+OUTPUT_FORMAT = ELEVENLABS_OUTPUT_FORMAT
+AUDIO_FORMAT = get_audio_format(OUTPUT_FORMAT)
+
+# Whitespace following sentence-ending punctuation
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+# Per-key lock files coordinating syntheses across worker processes
+LOCK_DIR = os.path.join(AUDIO_DIR, ".locks")
+
+# Syntheses currently in flight in this process, keyed by cache key
+_inflight: Dict[str, "asyncio.Task[Optional[str]]"] = {}
+# Message chunks started but not yet synthesized (possibly still queued for a
+# chunk slot), keyed by cache key
+_pending_chunks: Dict[str, "asyncio.Task[Optional[str]]"] = {}
+
+
+async def start_client(transport: Optional[httpx.AsyncBaseTransport] = None):
+    """
+    Open the TTS provider's shared resources (e.g. its HTTP connection pool)
+
+    A custom transport can be passed in for benchmarks.
+    """
+    await provider.start(transport=transport)
+    await audio_store.start()
+
+
+async def close_client():
+    """Close the TTS provider's and audio store's shared resources"""
+    await provider.close()
+    await audio_store.close()
+
+
+def audio_url(filename: str, request: Request) -> str:
+    """Build the public URL Twilio uses to fetch an audio file"""
+    base_url = str(request.base_url).rstrip("/")
+    return f"{base_url}/audio/{filename}"
+
+
+def synthesis_key(text: str) -> str:
+    """Return the audio cache key for text with the current voice parameters"""
+    return cache_key(
+        text,
+        provider.voice_id,
+        provider.model_id,
+        provider.voice_settings,
+        OUTPUT_FORMAT,
+    )
+
+
+def audio_filename(key: str) -> str:
+    """Return the content-addressed filename for a cache key"""
+    return f"{key}.{AUDIO_FORMAT.extension}"
+
+
+async def synthesize_audio(text: str, priority: int = PRIORITY_LIVE) -> Optional[str]:
+    """
+    Synthesize text with the TTS provider through the on-disk audio cache
+
+    Returns the filename of the audio inside AUDIO_DIR, or None if generation
+    fails. Identical requests are served from the cache without calling the
+    provider; upstream requests are scheduled at the given priority.
+    """
+    if not provider.is_configured():
+        logger.warning(f"TTS provider '{provider.name}' is not configured")
+        return None
+
+    key = synthesis_key(text)
+    filename = audio_cache.get(key)
+    if filename:
+        logger.info(f"ElevenLabs audio cache hit: {filename}")
+        return filename
+
+    # Single-flight: concurrent requests for the same key share one synthesis
+    inflight = _inflight.get(key)
+    if inflight is not None:
+        metrics.increment("tts_singleflight_coalesced")
+        return await asyncio.shield(inflight)
+
+    task = asyncio.create_task(_synthesize_once(text, key, priority))
+    _inflight[key] = task
+    task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # Shield so a cancelled waiter doesn't cancel the shared synthesis
+    return await asyncio.shield(task)
+
+
+def _open_lock_file(path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return open(path, "a")
+
+
+def _is_current_lock_file(lock_file, path: str) -> bool:
+    """Whether an open lock file is still the one at path (not unlinked since)"""
+    try:
+        return os.fstat(lock_file.fileno()).st_ino == os.stat(path).st_ino
+    except FileNotFoundError:
+        return False
+
+
+def _release_lock_file(lock_file, path: str):
+    # Unlink while still holding the lock so the directory doesn't grow; a
+    # worker waiting on the old file notices and opens a fresh one
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    lock_file.close()
+
+
+@asynccontextmanager
+async def _cross_worker_lock(key: str):
+    """
+    Hold an exclusive lock file for a synthesis key across worker processes
+
+    Every key has its own lock file in LOCK_DIR, removed again on release
+    (or by the janitor if the holder died). The lock is polled with a
+    non-blocking flock, and file operations run in a worker thread, so
+    waiting never blocks the event loop.
+    """
+    path = os.path.join(LOCK_DIR, f"{key}.lock")
+    while True:
+        lock_file = await asyncio.to_thread(_open_lock_file, path)
+        try:
+            delay = 0.01
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 0.2)
+            if await asyncio.to_thread(_is_current_lock_file, lock_file, path):
+                break
+        except BaseException:
+            lock_file.close()
+            raise
+        # The previous holder removed the file we locked; lock the new one
+        lock_file.close()
+    try:
+        yield
+    finally:
+        await asyncio.to_thread(_release_lock_file, lock_file, path)
+
+
+async def _synthesize_once(text: str, key: str, priority: int) -> Optional[str]:
+    """Run one upstream synthesis, coordinating with other workers if enabled"""
+    # Another replica may already have generated this audio
+    filename = await restore_from_store(key)
+    if filename:
+        return filename
+
+    if not TTS_CROSS_WORKER_LOCK:
+        return await _fetch_audio(text, key, priority)
+
+    async with _cross_worker_lock(key):
+        # Another worker may have produced the file while we waited
+        filename = audio_filename(key)
+        if os.path.exists(os.path.join(AUDIO_DIR, filename)):
+            metrics.increment("tts_singleflight_cross_worker_hits")
+            audio_cache.put(key, filename)
+            return filename
+        return await _fetch_audio(text, key, priority)
+
+
+async def restore_from_store(key: str) -> Optional[str]:
     """
-    Generate audio using ElevenLabs API and return a publicly accessible URL
+    Pull the audio for a cache key from the shared audio store into AUDIO_DIR
 
-    Returns the URL of the generated audio file, or None if generation fails
+    Returns the filename, or None when the store is local-only or doesn't
+    have the file.
     """
-    if not ELEVENLABS_API_KEY:
-        logger.warning("ElevenLabs API key not found")
+    if not audio_store.shared:
+        return None
+
+    filename = audio_filename(key)
+    digest = await audio_store.download(filename, os.path.join(AUDIO_DIR, filename))
+    if digest is None:
         return None
+    audio_cache.put(key, filename, digest=digest or None)
+    await audio_cache.save()
+    logger.info(f"Audio restored from {audio_store.name} store: {filename}")
+    return filename
 
+
+async def _stream_to_file(
+    chunks: AsyncIterator[bytes], filepath: str
+) -> Tuple[int, str]:
+    """
+    Write streamed audio to filepath without buffering the whole body
+
+    Chunks are written to a temp file from a worker thread as they arrive, so
+    memory per synthesis stays at about one chunk and the event loop never
+    blocks on disk I/O. The temp file is atomically renamed into place once
+    complete, so readers never see partial audio. Returns the audio size and
+    the SHA-256 of the audio payload (used as the file's ETag).
+    """
+    tmp_path = f"{filepath}.{uuid.uuid4().hex}.tmp"
+    f = await asyncio.to_thread(open, tmp_path, "wb")
     try:
-        # ElevenLabs API endpoint
-        url = f"https://api.elevenlabs.io/v1/text-to-speech/N2lVS1w4EtoT3dr4eOWO"
-
-        headers = {
-            "Accept": "audio/mpeg",
-            "Content-Type": "application/json",
-            "xi-api-key": ELEVENLABS_API_KEY,
-        }
-
-        data = {
-            "text": text,
-            "model_id": "eleven_monolingual_v1",
-            "voice_settings": {
-                "stability": 0.5,
-                "similarity_boost": 0.5,
-                "style": 0.5,  # More expressive
-                "use_speaker_boost": True,
-            },
-        }
-
-        response = requests.post(url, json=data, headers=headers)
-
-        if response.status_code == 200:
-            # Generate unique filename
-            filename = f"{uuid.uuid4()}.mp3"
-            filepath = os.path.join(AUDIO_DIR, filename)
-
-            # Save audio file
-            with open(filepath, "wb") as f:
-                f.write(response.content)
-
-            # Return public URL
-            base_url = str(request.base_url).rstrip("/")
-            audio_url = f"{base_url}/audio/{filename}"
-
-            logger.info(f"ElevenLabs audio generated: {audio_url}")
-            return audio_url
-        else:
-            logger.error(
-                f"ElevenLabs API error: {response.status_code} - {response.text}"
+        size = 0
+        digest = hashlib.sha256()
+        if AUDIO_FORMAT.wrap_ulaw_wav:
+            # Placeholder header, rewritten once the data size is known
+            await asyncio.to_thread(f.write, ulaw_wav_header(0))
+        async for chunk in chunks:
+            await asyncio.to_thread(f.write, chunk)
+            digest.update(chunk)
+            size += len(chunk)
+
+        if AUDIO_FORMAT.wrap_ulaw_wav:
+
+            def write_header():
+                f.seek(0)
+                f.write(ulaw_wav_header(size))
+
+            await asyncio.to_thread(write_header)
+        await asyncio.to_thread(f.close)
+        await asyncio.to_thread(os.replace, tmp_path, filepath)
+        return size, digest.hexdigest()
+    except BaseException:
+        f.close()
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+async def _timed_stream(
+    chunks: AsyncIterator[bytes], on_first_chunk
+) -> AsyncIterator[bytes]:
+    """Pass chunks through, calling on_first_chunk() when the first arrives"""
+    first = True
+    async for chunk in chunks:
+        if first:
+            on_first_chunk()
+            first = False
+        yield chunk
+
+
+async def _fetch_audio(text: str, key: str, priority: int) -> Optional[str]:
+    """Request audio from the TTS provider and store it in the cache under key"""
+    # Skip synthesis entirely while the provider is failing
+    if elevenlabs_breaker.is_open():
+        logger.warning("TTS circuit breaker is open, skipping synthesis")
+        return None
+
+    # Content-addressed filename, so identical requests share a file
+    filename = audio_filename(key)
+    filepath = os.path.join(AUDIO_DIR, filename)
+
+    async def request() -> Optional[Tuple[int, str]]:
+        # Admitted only once a scheduler slot is free, so a half-open probe
+        # goes upstream right away instead of waiting in the queue
+        allowed, is_probe = elevenlabs_breaker.allow_request()
+        if not allowed:
+            return None
+
+        # Time the upstream call to its first audio, not our own queueing or
+        # the length of the message being streamed
+        start = time.perf_counter()
+        latency_ms = None
+
+        def first_chunk():
+            nonlocal latency_ms
+            latency_ms = (time.perf_counter() - start) * 1000
+
+        try:
+            result = await _stream_to_file(
+                _timed_stream(
+                    provider.synthesize_stream(text, OUTPUT_FORMAT), first_chunk
+                ),
+                filepath,
             )
+        except TTSProviderError as e:
+            if e.is_outage:
+                elevenlabs_breaker.record_failure(is_probe)
+            raise
+        except Exception:
+            elevenlabs_breaker.record_failure(is_probe)
+            raise
+        finally:
+            if is_probe:
+                elevenlabs_breaker.release_probe()
+        if latency_ms is None:
+            latency_ms = (time.perf_counter() - start) * 1000
+        elevenlabs_breaker.record_success(latency_ms, is_probe)
+        return result
+
+    try:
+        # Bounded concurrency towards the provider, live calls first
+        result = await tts_scheduler.run(priority, request)
+        if result is None:
+            logger.warning("TTS circuit breaker is open, skipping synthesis")
             return None
+        size, digest = result
+
+        audio_cache.put(key, filename, digest=digest)
+        await audio_cache.save()
+        # Publish before handing out the URL so any replica can serve it
+        await audio_store.upload(filename, filepath, digest)
 
+        logger.info(
+            f"TTS audio generated with {provider.name}: {filename} ({size} bytes)"
+        )
+        return filename
+
+    except QueueFullError as e:
+        logger.warning(f"TTS synthesis rejected: {str(e)}")
+        return None
+    except TTSProviderError as e:
+        logger.error(str(e))
+        return None
     except Exception as e:
-        logger.error(f"Error generating ElevenLabs audio: {str(e)}")
+        logger.error(f"Error generating TTS audio: {str(e)}")
+        return None
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text at sentence boundaries, dropping empty fragments"""
+    return [chunk.strip() for chunk in SENTENCE_BOUNDARY.split(text) if chunk.strip()]
+
+
+def message_chunks(text: str, segments: Optional[List[Segment]] = None) -> List[str]:
+    """
+    Split a message into the chunks it is synthesized and played as
+
+    Long messages are split at sentence boundaries when chunking is enabled.
+    Templates are split into their segments, with static segments also split
+    by sentence, so the static parts are cached once and shared by every
+    call using the template.
+    """
+    if segments:
+        chunks = []
+        for segment in segments:
+            if segment.static and TTS_CHUNKING:
+                chunks.extend(split_sentences(segment.text) or [segment.text])
+            else:
+                chunks.append(segment.text)
+        return chunks
+    if TTS_CHUNKING and len(text) >= TTS_CHUNK_MIN_CHARS:
+        return split_sentences(text) or [text]
+    return [text]
+
+
+def _start_chunks(chunks: List[str], priority: int) -> List["asyncio.Task[Optional[str]]"]:
+    """
+    Start synthesizing chunks concurrently, each with its own cache entry
+
+    At most TTS_CHUNK_CONCURRENCY chunks of a message are in flight; they
+    acquire the semaphore in order, so the first chunk starts first. Until
+    done, each chunk's task is registered under its cache key, so /audio
+    can wait for a chunk that is requested before it is ready and messages
+    sharing a chunk share its synthesis.
+    """
+    semaphore = asyncio.Semaphore(TTS_CHUNK_CONCURRENCY)
+
+    async def synthesize_chunk(chunk: str) -> Optional[str]:
+        async with semaphore:
+            return await synthesize_audio(chunk, priority)
+
+    tasks = []
+    for chunk in chunks:
+        key = synthesis_key(chunk)
+        task = _pending_chunks.get(key)
+        if task is None:
+            task = asyncio.create_task(synthesize_chunk(chunk))
+            _pending_chunks[key] = task
+            task.add_done_callback(lambda _, key=key: _pending_chunks.pop(key, None))
+        tasks.append(task)
+    metrics.observe("tts_chunks_per_message", len(chunks))
+    return tasks
+
+
+async def _synthesize_chunks(chunks: List[str], priority: int) -> Optional[List[str]]:
+    """Synthesize every chunk; the filenames in order, or None if any fails"""
+    tasks = _start_chunks(chunks, priority)
+    # Shielded since other messages may share a chunk's task
+    filenames = await asyncio.gather(*(asyncio.shield(task) for task in tasks))
+    if not all(filenames):
+        return None
+    return list(filenames)
+
+
+def _chunk_failed(task: "asyncio.Task[Optional[str]]") -> bool:
+    return task.done() and (
+        task.cancelled() or task.exception() is not None or not task.result()
+    )
+
+
+async def _synthesize_for_playback(
+    chunks: List[str], priority: int
+) -> Optional[List[Optional[str]]]:
+    """
+    Start synthesizing chunks and return once the first has settled
+
+    Playback can start on the first chunk while the rest keep synthesizing
+    in the background. Returns every chunk's audio filename in playback
+    order (filenames are content-addressed, so known before the audio is
+    written), None for chunks that have already failed, or None if all
+    have.
+    """
+    tasks = _start_chunks(chunks, priority)
+    await asyncio.wait([tasks[0]])
+    filenames = [
+        None if _chunk_failed(task) else audio_filename(synthesis_key(chunk))
+        for chunk, task in zip(chunks, tasks)
+    ]
+    return filenames if any(filenames) else None
+
+
+async def synthesize_text(
+    text: str, priority: int = PRIORITY_LIVE
+) -> Optional[List[str]]:
+    """
+    Synthesize a whole message, chunked by sentence when enabled
+
+    Long messages are split at sentence boundaries and the chunks are
+    synthesized concurrently, so sentences shared between messages are reused.
+    Returns the audio filenames in playback order once all are written, or
+    None on failure.
+    """
+    chunks = message_chunks(text)
+    if len(chunks) == 1:
+        filename = await synthesize_audio(text, priority)
+        return [filename] if filename else None
+
+    return await _synthesize_chunks(chunks, priority)
+
+
+async def wait_for_audio(key: str) -> bool:
+    """
+    Wait for the audio of a cache key that is still being synthesized
+
+    Used by /audio for chunks handed to Twilio before they were ready. Waits
+    for this process's synthesis of the key, or with TTS_CROSS_WORKER_LOCK
+    for another worker holding the key's lock, at most TTS_CHUNK_WAIT_SECONDS.
+    Returns whether the audio is now on disk.
+    """
+    filepath = os.path.join(AUDIO_DIR, audio_filename(key))
+    task = _pending_chunks.get(key) or _inflight.get(key)
+    if task is not None:
+        metrics.increment("tts_chunk_waits")
+        try:
+            await asyncio.wait_for(asyncio.shield(task), TTS_CHUNK_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            return False
+        except Exception:
+            pass
+        return await asyncio.to_thread(os.path.exists, filepath)
+
+    if not TTS_CROSS_WORKER_LOCK:
+        return False
+    lock_path = os.path.join(LOCK_DIR, f"{key}.lock")
+    deadline = time.monotonic() + TTS_CHUNK_WAIT_SECONDS
+    # The lock file is removed once the holder has written the audio
+    while await asyncio.to_thread(os.path.exists, lock_path):
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(0.05)
+    return await asyncio.to_thread(os.path.exists, filepath)
+
+
+def presynthesize_audio(
+    text: str,
+    priority: int = PRIORITY_PRESYNTH,
+    segments: Optional[List[Segment]] = None,
+) -> "asyncio.Task[Optional[List[Optional[str]]]]":
+    """
+    Start synthesizing a call's message in the background
+
+    Used when a call is dispatched so synthesis runs while Twilio is still
+    ringing the callee. Messages built from a template pass their segments so
+    the static parts come from the cache. The returned task resolves as soon
+    as the first chunk is ready, to the chunks' audio filenames (see
+    _synthesize_for_playback).
+    """
+    if segments:
+        metrics.increment(
+            "tts_template_static_segments", sum(s.static for s in segments)
+        )
+        metrics.increment(
+            "tts_template_variable_segments", sum(not s.static for s in segments)
+        )
+    return asyncio.create_task(
+        _synthesize_for_playback(message_chunks(text, segments), priority)
+    )
+
+
+async def resolve_call_audio(
+    record: CallRecord, request: Request
+) -> Optional[List[Tuple[Optional[str], str]]]:
+    """
+    Return the audio for a call's chunks within the TTS latency budget
+
+    Awaits the call's pre-synthesis task until its first chunk is ready, or
+    starts one for calls stored without it (e.g. token-routed calls answered
+    by another replica). If the first chunk failed, e.g. its request was shed
+    from the queue or the breaker was open, the pre-synthesis is retried once
+    at live priority. Returns one (audio URL, text) pair per chunk, in
+    playback order; the URL is None for a chunk whose synthesis has failed,
+    so just that chunk falls back to Twilio TTS. Chunks still synthesizing
+    get their URL too: /audio waits for them. Returns None if the first chunk
+    misses the deadline or nothing could be synthesized; the synthesis keeps
+    running in the background and fills the cache for the next call.
+    """
+    audio_task = record.audio_task
+    presynthesized = audio_task is not None
+    if audio_task is None:
+        audio_task = presynthesize_audio(
+            record.sms_body, PRIORITY_LIVE, segments=record.segments
+        )
+        record.audio_task = audio_task
+    else:
+        metrics.increment(
+            "tts_presynth_ready" if audio_task.done() else "tts_presynth_pending"
+        )
+
+    start = time.perf_counter()
+    deadline = start + TTS_DEADLINE_MS / 1000
+    try:
+        # Shield the task so hitting the deadline doesn't cancel the synthesis
+        filenames = await asyncio.wait_for(
+            asyncio.shield(audio_task), timeout=TTS_DEADLINE_MS / 1000
+        )
+        if not (filenames and filenames[0]) and presynthesized:
+            metrics.increment("tts_presynth_retried")
+            audio_task = presynthesize_audio(
+                record.sms_body, PRIORITY_LIVE, segments=record.segments
+            )
+            record.audio_task = audio_task
+            filenames = await asyncio.wait_for(
+                asyncio.shield(audio_task),
+                timeout=max(0.0, deadline - time.perf_counter()),
+            )
+    except asyncio.TimeoutError:
+        metrics.increment("tts_deadline_exceeded")
+        logger.warning(
+            f"ElevenLabs synthesis missed the {TTS_DEADLINE_MS}ms deadline, "
+            "falling back to Twilio TTS"
+        )
+        return None
+
+    metrics.increment("tts_deadline_met")
+    metrics.observe("tts_wait_ms", (time.perf_counter() - start) * 1000)
+    if not filenames:
         return None
+    chunks = message_chunks(record.sms_body, record.segments)
+    fallbacks = filenames.count(None)
+    if fallbacks:
+        metrics.increment("tts_chunk_fallbacks", fallbacks)
+        logger.warning(
+            f"{fallbacks} of {len(chunks)} chunks failed to synthesize, "
+            "falling back to Twilio TTS for those"
+        )
+    record.audio_files = [filename for filename in filenames if filename]
+    return [
+        (audio_url(filename, request) if filename else None, chunk)
+        for filename, chunk in zip(filenames, chunks)
+    ]
@@ -0,0 +1,168 @@
+import os
+import time
+import fcntl
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Set, Tuple
+from config import (
+    AUDIO_DIR,
+    AUDIO_TTL_SECONDS,
+    AUDIO_DIR_QUOTA_BYTES,
+    JANITOR_INTERVAL_SECONDS,
+)
+from utils import metrics
+from utils.audio_cache import audio_cache
+from utils.elevenlabs import LOCK_DIR
+
+logger = logging.getLogger(__name__)
+
+# Partial downloads (".tmp") written to within this long are still in progress;
+# older ones were left behind by a crash and are swept like any other file
+PARTIAL_FILE_GRACE_SECONDS = 3600
+
+
+def _scan(directory: str) -> List[Tuple[str, int, float]]:
+    """List (filename, size, mtime) for the audio files in a directory"""
+    files = []
+    now = time.time()
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            # Skip the cache index, lock directory and other dotfiles
+            if entry.name.startswith(".") or not entry.is_file():
+                continue
+            stat = entry.stat()
+            # Never delete audio that is still being streamed to disk
+            if (
+                entry.name.endswith(".tmp")
+                and now - stat.st_mtime < PARTIAL_FILE_GRACE_SECONDS
+            ):
+                continue
+            files.append((entry.name, stat.st_size, stat.st_mtime))
+    return files
+
+
+def _remove(directory: str, victims: List[Tuple[str, int, float]]) -> int:
+    """Delete files that haven't changed since the scan, returning bytes freed"""
+    reclaimed = 0
+    for filename, size, mtime in victims:
+        filepath = os.path.join(directory, filename)
+        try:
+            # A file rewritten since the scan (e.g. re-synthesized) is kept
+            if os.stat(filepath).st_mtime != mtime:
+                continue
+            os.remove(filepath)
+            reclaimed += size
+        except FileNotFoundError:
+            pass
+    return reclaimed
+
+
+def _remove_stale_locks(lock_dir: str) -> int:
+    """
+    Delete synthesis lock files left behind by workers that died
+
+    A file is only removed while holding its lock, so a worker that holds
+    or is about to take it is never affected. Returns how many were removed.
+    """
+    if not os.path.isdir(lock_dir):
+        return 0
+    removed = 0
+    with os.scandir(lock_dir) as entries:
+        for entry in entries:
+            try:
+                with open(entry.path, "a") as lock_file:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    os.remove(entry.path)
+                    removed += 1
+            except (BlockingIOError, FileNotFoundError):
+                pass
+    return removed
+
+
+async def sweep_audio_dir(protected: Set[str]) -> Dict[str, float]:
+    """
+    Remove expired audio and enforce the AUDIO_DIR byte quota
+
+    Files unused for longer than AUDIO_TTL_SECONDS are deleted, then the
+    least recently used files are deleted until the directory fits within
+    AUDIO_DIR_QUOTA_BYTES. Protected files (referenced by active calls) and
+    pinned cache entries (static prompts) are never deleted.
+    """
+    start = time.perf_counter()
+    files = await asyncio.to_thread(_scan, AUDIO_DIR)
+    now = time.time()
+
+    total_bytes = 0
+    candidates = []
+    for filename, size, mtime in files:
+        total_bytes += size
+        if filename in protected:
+            continue
+
+        # Cached files are content-addressed: "<cache key>.<extension>". A
+        # leftover partial file shares its key but isn't the cached file.
+        entry = None
+        if not filename.endswith(".tmp"):
+            entry = audio_cache.entries.get(filename.split(".", 1)[0])
+        if entry is not None and entry.get("pinned"):
+            continue
+        last_used = max(mtime, entry["last_access"]) if entry else mtime
+        candidates.append((last_used, filename, size, mtime))
+
+    # Oldest first: expired files form a prefix, then trim to the quota
+    candidates.sort()
+    remaining = total_bytes
+    victims = []
+    for last_used, filename, size, mtime in candidates:
+        if now - last_used <= AUDIO_TTL_SECONDS and remaining <= AUDIO_DIR_QUOTA_BYTES:
+            break
+        victims.append((filename, size, mtime))
+        remaining -= size
+
+    # Drop victims from the cache index first so no new lookups return them
+    for filename, _, _ in victims:
+        if not filename.endswith(".tmp"):
+            audio_cache.discard(filename.split(".", 1)[0])
+
+    reclaimed = await asyncio.to_thread(_remove, AUDIO_DIR, victims)
+    stale_locks = await asyncio.to_thread(_remove_stale_locks, LOCK_DIR)
+    if victims:
+        await audio_cache.save()
+
+    scan_ms = (time.perf_counter() - start) * 1000
+    metrics.increment("janitor_deleted_files", len(victims))
+    metrics.increment("janitor_reclaimed_bytes", reclaimed)
+    metrics.observe("janitor_scan_ms", scan_ms)
+    metrics.set_gauge("audio_dir_bytes", total_bytes - reclaimed)
+    metrics.set_gauge("audio_dir_files", len(files) - len(victims))
+
+    return {
+        "scanned_files": len(files),
+        "deleted_files": len(victims),
+        "reclaimed_bytes": reclaimed,
+        "stale_locks": stale_locks,
+        "scan_ms": scan_ms,
+    }
+
+
+async def run_janitor(protected_files: Callable[[], Awaitable[Set[str]]]):
+    """
+    Sweep AUDIO_DIR every JANITOR_INTERVAL_SECONDS until cancelled
+
+    protected_files is awaited before each sweep and returns the filenames
+    still referenced by active calls, on this worker or any other sharing
+    AUDIO_DIR.
+    """
+    while True:
+        try:
+            stats = await sweep_audio_dir(await protected_files())
+            if stats["deleted_files"]:
+                logger.info(
+                    f"Audio janitor removed {stats['deleted_files']} files, "
+                    f"reclaimed {stats['reclaimed_bytes']} bytes "
+                    f"in {stats['scan_ms']:.1f}ms"
+                )
+        except Exception as e:
+            logger.error(f"Error sweeping audio directory: {str(e)}")
+
+        await asyncio.sleep(JANITOR_INTERVAL_SECONDS)
@@ -0,0 +1,59 @@
+import re
+from string import Formatter
+from typing import Dict, List, NamedTuple, Tuple
+
+
+class Segment(NamedTuple):
+    """A piece of a rendered message template"""
+
+    text: str
+    # Static segments come from the template itself and are shared by every
+    # call using it; variable segments are the personalized values
+    static: bool
+
+
+# Literal text worth synthesizing on its own has at least a letter or digit
+SPOKEN_TEXT = re.compile(r"[^\W_]")
+
+
+def render_template(
+    template: str, variables: Dict[str, str]
+) -> Tuple[str, List[Segment]]:
+    """
+    Render a str.format-style template such as "Hi {name}, see you at {time}"
+
+    Returns the full message text and its ordered segments. Whitespace-only
+    segments are dropped since there is nothing to synthesize, and
+    punctuation-only literals (like the "." in "Hi {name}.") are attached to
+    a neighbouring segment rather than played as a clip of their own.
+    Raises ValueError for malformed templates or missing variables.
+    """
+    segments: List[Segment] = []
+    parts = []
+    # Punctuation seen before any segment, prepended to the first one
+    prefix = ""
+    for literal, field, spec, _ in Formatter().parse(template):
+        parts.append(literal)
+        if SPOKEN_TEXT.search(literal):
+            segments.append(Segment(prefix + literal.strip(), static=True))
+            prefix = ""
+        elif literal.strip() and segments:
+            last = segments[-1]
+            segments[-1] = Segment(last.text + literal.strip(), last.static)
+        elif literal.strip():
+            prefix += literal.strip()
+        if field is None:
+            continue
+        if field not in variables:
+            raise ValueError(f"Missing template variable '{field}'")
+
+        value = format(str(variables[field]), spec or "")
+        parts.append(value)
+        if value.strip():
+            segments.append(Segment(prefix + value.strip(), static=False))
+            prefix = ""
+
+    if prefix:
+        # Nothing but punctuation; keep it rather than lose the message
+        segments.append(Segment(prefix, static=True))
+    return "".join(parts), segments
@@ -0,0 +1,68 @@
+import threading
+from typing import Dict, List
+
+# Simple in-process metrics registry (exported as JSON on /metrics)
+_lock = threading.Lock()
+_counters: Dict[str, int] = {}
+_gauges: Dict[str, float] = {}
+_observations: Dict[str, List[float]] = {}
+
+# Keep only the most recent observations per metric so memory stays bounded
+MAX_OBSERVATIONS = 1000
+
+
+def increment(name: str, value: int = 1):
+    """Increment a counter"""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def counter(name: str) -> int:
+    """Return a counter's current value"""
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def set_gauge(name: str, value: float):
+    """Set a gauge to its current value"""
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name: str, value: float):
+    """Record an observation (e.g. a latency in milliseconds) for a summary"""
+    with _lock:
+        values = _observations.setdefault(name, [])
+        values.append(value)
+        if len(values) > MAX_OBSERVATIONS:
+            del values[: len(values) - MAX_OBSERVATIONS]
+
+
+def _summarize(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    count = len(ordered)
+
+    def percentile(p: float) -> float:
+        return ordered[min(count - 1, int(count * p))]
+
+    return {
+        "count": count,
+        "p50": percentile(0.50),
+        "p90": percentile(0.90),
+        "p99": percentile(0.99),
+        "max": ordered[-1],
+    }
+
+
+def snapshot() -> Dict[str, Dict]:
+    """Return a copy of all counters, gauges and observation summaries"""
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "summaries": {
+                name: _summarize(values)
+                for name, values in _observations.items()
+                if values
+            },
+        }
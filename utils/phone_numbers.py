@@ -0,0 +1,15 @@
+import re
+from typing import Optional
+
+# E.164: a plus sign and up to 15 digits, no leading zero
+E164_PATTERN = re.compile(r"^\+[1-9]\d{6,14}$")
+# Formatting people commonly put in phone numbers
+PHONE_FORMATTING = re.compile(r"[\s().-]")
+
+INVALID_PHONE_NUMBER = "Phone number must be in E.164 format (e.g., +1234567890)"
+
+
+def normalize_phone_number(phone_number: str) -> Optional[str]:
+    """Strip formatting from a phone number; None if it isn't valid E.164"""
+    phone_number = PHONE_FORMATTING.sub("", phone_number)
+    return phone_number if E164_PATTERN.match(phone_number) else None
@@ -0,0 +1,97 @@
+import json
+import asyncio
+import logging
+from typing import Dict, Union
+from fastapi import Request
+from twilio.twiml.voice_response import VoiceResponse, Gather
+from config import (
+    IVR_PROMPTS_FILE,
+    IVR_PROMPT_RETRY_SECONDS,
+    IVR_PROMPT_RETRY_MAX_SECONDS,
+)
+from utils.audio_cache import audio_cache
+from utils.elevenlabs import audio_url, provider, synthesize_audio, synthesis_key
+from utils.tts_scheduler import PRIORITY_WARMUP
+
+logger = logging.getLogger(__name__)
+
+# Fixed IVR prompts, overridable through the JSON file at IVR_PROMPTS_FILE
+DEFAULT_PROMPTS = {
+    "menu": "Press 1 to end the call, or press 2 for a special message.",
+    "no_input": "I didn't receive any input. Goodbye!",
+    "goodbye": "Goodbye!",
+    "special_message": "Thanks for picking up the phone dude!",
+    "have_a_great_day": "Have a great day!",
+    "invalid_option": "Invalid option. Goodbye!",
+}
+
+# Prompt name -> pre-rendered audio filename, filled in by warmup_prompts()
+_prompt_audio: Dict[str, str] = {}
+
+
+def load_prompts() -> Dict[str, str]:
+    """Return the IVR prompt texts, applying overrides from IVR_PROMPTS_FILE"""
+    prompts = dict(DEFAULT_PROMPTS)
+    if IVR_PROMPTS_FILE:
+        try:
+            with open(IVR_PROMPTS_FILE, "r") as f:
+                prompts.update(json.load(f))
+        except Exception as e:
+            logger.error(f"Could not load IVR prompts from {IVR_PROMPTS_FILE}: {e}")
+    return prompts
+
+
+PROMPTS = load_prompts()
+
+
+async def warmup_prompts():
+    """
+    Pre-render the static IVR prompts through the TTS layer
+
+    Each prompt is synthesized once and pinned in the audio cache so it is
+    never evicted. Prompts that fail to render keep using Twilio TTS and are
+    retried with exponential backoff (IVR_PROMPT_RETRY_SECONDS, up to
+    IVR_PROMPT_RETRY_MAX_SECONDS) until every prompt is cached.
+    """
+
+    async def render(name: str, text: str):
+        filename = await synthesize_audio(text, PRIORITY_WARMUP)
+        if filename:
+            audio_cache.pin(synthesis_key(text))
+            _prompt_audio[name] = filename
+
+    delay = IVR_PROMPT_RETRY_SECONDS
+    while True:
+        pending = {
+            name: text for name, text in PROMPTS.items() if name not in _prompt_audio
+        }
+        await asyncio.gather(*(render(name, text) for name, text in pending.items()))
+        await audio_cache.save()
+        logger.info(f"IVR prompts pre-rendered: {len(_prompt_audio)}/{len(PROMPTS)}")
+        if len(_prompt_audio) == len(PROMPTS) or not provider.is_configured():
+            return
+
+        logger.warning(
+            f"{len(PROMPTS) - len(_prompt_audio)} IVR prompts failed to render, "
+            f"retrying in {delay:g}s"
+        )
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, IVR_PROMPT_RETRY_MAX_SECONDS)
+
+
+def add_prompt(verb: Union[VoiceResponse, Gather], name: str, request: Request):
+    """
+    Append a static prompt to a TwiML verb
+
+    Emits <Play> with the pre-rendered audio when available, and falls back
+    to the Polly <Say> voice otherwise.
+    """
+    filename = _prompt_audio.get(name)
+    if filename:
+        verb.play(audio_url(filename, request))
+        return
+
+    verb.say(
+        f"<speak><prosody rate='medium' pitch='high' volume='medium'>{PROMPTS[name]}</prosody></speak>",
+        voice="Polly.Emma",
+    )
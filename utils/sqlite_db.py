@@ -0,0 +1,82 @@
+import sqlite3
+import asyncio
+import logging
+import threading
+from typing import Callable, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SQLiteDatabase:
+    """
+    A local SQLite database in WAL mode used from the event loop
+
+    One connection is shared by the thread pool and used one transaction at
+    a time. Queries run in a worker thread so they never block the event
+    loop. setup is called with the new connection to create the schema.
+    """
+
+    def __init__(
+        self, path: str, setup: Callable[[sqlite3.Connection], None], label: str
+    ):
+        self.path = path
+        self.setup = setup
+        self.label = label
+        self.connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    async def open(self):
+        if self.connection is not None:
+            return
+
+        def connect():
+            connection = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL only risks the last transactions on power loss
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA busy_timeout=5000")
+            self.setup(connection)
+            return connection
+
+        self.connection = await asyncio.to_thread(connect)
+        logger.info(f"SQLite {self.label} opened at {self.path}")
+
+    async def close(self):
+        if self.connection is not None:
+
+            def close():
+                # Wait for a query left running by a cancelled task
+                with self._lock:
+                    self.connection.close()
+
+            await asyncio.to_thread(close)
+            self.connection = None
+
+    def _transaction(self, work: Callable[[sqlite3.Connection], T]) -> T:
+        # The connection is in autocommit mode, so the transaction is explicit;
+        # IMMEDIATE takes the write lock up front rather than upgrading later
+        with self._lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(self.connection)
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+            return result
+
+    async def transaction(self, work: Callable[[sqlite3.Connection], T]) -> T:
+        """Run work(connection) in a worker thread inside one transaction"""
+        if self.connection is None:
+            await self.open()
+        return await asyncio.to_thread(self._transaction, work)
+
+    async def query(self, query: str, params: Tuple = ()) -> list:
+        """Run a single statement and return its rows"""
+        return await self.transaction(
+            lambda connection: connection.execute(query, params).fetchall()
+        )
@@ -0,0 +1,247 @@
+import math
+import random
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+import httpx
+from config import (
+    ELEVENLABS_API_KEY,
+    ELEVENLABS_VOICE_ID,
+    ELEVENLABS_MODEL_ID,
+    ELEVENLABS_HTTP2,
+    ELEVENLABS_MAX_CONNECTIONS,
+    ELEVENLABS_MAX_KEEPALIVE_CONNECTIONS,
+    ELEVENLABS_KEEPALIVE_EXPIRY,
+    ELEVENLABS_TIMEOUT,
+    FAKE_TTS_LATENCY_MS,
+    FAKE_TTS_LATENCY_SIGMA,
+    FAKE_TTS_ERROR_RATE,
+    FAKE_TTS_SEED,
+    TTS_STREAM_CHUNK_BYTES,
+)
+from utils.audio_formats import get_audio_format
+
+logger = logging.getLogger(__name__)
+
+ELEVENLABS_API_URL = "https://api.elevenlabs.io/v1"
+
+
+class TTSProviderError(Exception):
+    """A synthesis request was refused or failed upstream"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def is_outage(self) -> bool:
+        """Whether the error points at the upstream rather than the request"""
+        return (
+            self.status_code is None
+            or self.status_code == 429
+            or self.status_code >= 500
+        )
+
+
+class TTSProvider:
+    """
+    Base class for text-to-speech backends
+
+    A provider streams audio for text in one of the formats listed in
+    utils.audio_formats. voice_id, model_id and voice_settings are part of
+    the audio cache key, so they must describe everything that changes the
+    produced audio.
+    """
+
+    name = "base"
+    voice_id = ""
+    model_id = ""
+    voice_settings: Dict[str, Any] = {}
+
+    def is_configured(self) -> bool:
+        """Return whether the provider has the credentials it needs"""
+        return True
+
+    async def start(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        """Open long-lived resources (connection pools)"""
+
+    async def close(self):
+        """Release long-lived resources"""
+
+    def synthesize_stream(self, text: str, output_format: str) -> AsyncIterator[bytes]:
+        """Stream the audio for text in chunks, raising TTSProviderError on failure"""
+        raise NotImplementedError
+
+
+class ElevenLabsProvider(TTSProvider):
+    """ElevenLabs text-to-speech over a shared, pooled HTTP client"""
+
+    name = "elevenlabs"
+    voice_id = ELEVENLABS_VOICE_ID
+    model_id = ELEVENLABS_MODEL_ID
+    voice_settings = {
+        "stability": 0.5,
+        "similarity_boost": 0.5,
+        "style": 0.5,  # More expressive
+        "use_speaker_boost": True,
+    }
+
+    def __init__(self):
+        self.client: Optional[httpx.AsyncClient] = None
+
+    def is_configured(self) -> bool:
+        return bool(ELEVENLABS_API_KEY)
+
+    async def start(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        """
+        Open the shared ElevenLabs HTTP client
+
+        Keeps a pool of keep-alive (optionally HTTP/2) connections to
+        ElevenLabs so each synthesis doesn't pay for a new TCP/TLS handshake.
+        A custom transport can be passed in for benchmarks.
+        """
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                base_url=ELEVENLABS_API_URL,
+                http2=ELEVENLABS_HTTP2 and transport is None,
+                limits=httpx.Limits(
+                    max_connections=ELEVENLABS_MAX_CONNECTIONS,
+                    max_keepalive_connections=ELEVENLABS_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=ELEVENLABS_KEEPALIVE_EXPIRY,
+                ),
+                timeout=ELEVENLABS_TIMEOUT,
+                transport=transport,
+            )
+            logger.info("ElevenLabs HTTP client started")
+
+    async def close(self):
+        """Close the shared ElevenLabs HTTP client and its pooled connections"""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+            logger.info("ElevenLabs HTTP client closed")
+
+    async def synthesize_stream(
+        self, text: str, output_format: str
+    ) -> AsyncIterator[bytes]:
+        if self.client is None:
+            await self.start()
+
+        headers = {
+            "Accept": get_audio_format(output_format).accept,
+            "Content-Type": "application/json",
+            "xi-api-key": ELEVENLABS_API_KEY,
+        }
+
+        data = {
+            "text": text,
+            "model_id": self.model_id,
+            "voice_settings": self.voice_settings,
+        }
+
+        try:
+            # Streaming endpoint: audio arrives (and is written) chunk by chunk
+            async with self.client.stream(
+                "POST",
+                f"/text-to-speech/{self.voice_id}/stream",
+                params={"output_format": output_format},
+                json=data,
+                headers=headers,
+            ) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    raise TTSProviderError(
+                        f"ElevenLabs API error: {response.status_code} - {response.text}",
+                        status_code=response.status_code,
+                    )
+                async for chunk in response.aiter_bytes(TTS_STREAM_CHUNK_BYTES):
+                    yield chunk
+        except httpx.HTTPError as e:
+            raise TTSProviderError(f"ElevenLabs request failed: {str(e)}")
+
+
+# Silent MPEG audio frames: (frame header, frame length in bytes). Each frame
+# holds 1152 (MPEG-1) or 576 (MPEG-2) samples, i.e. ~26 ms at these rates.
+FAKE_MP3_FRAMES = {
+    "mp3_44100_128": (b"\xff\xfb\x90\xc4", 417),
+    "mp3_44100_64": (b"\xff\xfb\x50\xc4", 208),
+    "mp3_44100_32": (b"\xff\xfb\x10\xc4", 104),
+    "mp3_22050_32": (b"\xff\xf3\x40\xc4", 104),
+}
+FAKE_FRAMES_PER_SECOND = 44100 / 1152
+FAKE_CHARS_PER_SECOND = 15
+ULAW_SILENCE = b"\xff"
+
+
+class FakeTTSProvider(TTSProvider):
+    """
+    Offline stand-in for ElevenLabs used for load tests and benchmarks
+
+    Returns deterministic, correctly sized silent audio (about one second per
+    15 characters) after a log-normally distributed delay around
+    FAKE_TTS_LATENCY_MS, and fails FAKE_TTS_ERROR_RATE of the requests with
+    a 429 or 5xx status. Set FAKE_TTS_SEED for reproducible runs.
+    """
+
+    name = "fake"
+    voice_id = "fake"
+    model_id = "fake_tts_v1"
+    voice_settings: Dict[str, Any] = {}
+
+    def __init__(
+        self,
+        latency_ms: float = FAKE_TTS_LATENCY_MS,
+        latency_sigma: float = FAKE_TTS_LATENCY_SIGMA,
+        error_rate: float = FAKE_TTS_ERROR_RATE,
+        seed: Optional[int] = FAKE_TTS_SEED,
+    ):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+    def render(self, text: str, output_format: str) -> Iterator[bytes]:
+        """Generate the deterministic audio for text in ~TTS_STREAM_CHUNK_BYTES chunks"""
+        seconds = max(1.0, len(text) / FAKE_CHARS_PER_SECOND)
+        if output_format == "ulaw_8000":
+            unit, count = ULAW_SILENCE, int(8000 * seconds)
+        else:
+            header, frame_length = FAKE_MP3_FRAMES[output_format]
+            unit = header + bytes(frame_length - len(header))
+            count = math.ceil(seconds * FAKE_FRAMES_PER_SECOND)
+
+        units_per_chunk = max(1, TTS_STREAM_CHUNK_BYTES // len(unit))
+        for start in range(0, count, units_per_chunk):
+            yield unit * min(units_per_chunk, count - start)
+
+    async def synthesize_stream(
+        self, text: str, output_format: str
+    ) -> AsyncIterator[bytes]:
+        # The simulated latency is the time to the first byte
+        delay = self.latency_ms * math.exp(self.random.gauss(0, self.latency_sigma))
+        await asyncio.sleep(delay / 1000)
+
+        if self.random.random() < self.error_rate:
+            status_code = self.random.choice([429, 500, 503])
+            raise TTSProviderError(
+                f"Fake TTS error: {status_code}", status_code=status_code
+            )
+        for chunk in self.render(text, output_format):
+            yield chunk
+            await asyncio.sleep(0)
+
+
+TTS_PROVIDERS = {
+    ElevenLabsProvider.name: ElevenLabsProvider,
+    FakeTTSProvider.name: FakeTTSProvider,
+}
+
+
+def create_provider(name: str) -> TTSProvider:
+    """Instantiate the TTS provider configured by name"""
+    if name not in TTS_PROVIDERS:
+        raise ValueError(
+            f"Unknown TTS provider '{name}'. "
+            f"Available providers: {', '.join(TTS_PROVIDERS)}"
+        )
+    return TTS_PROVIDERS[name]()
@@ -0,0 +1,103 @@
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+from typing import Awaitable, Callable, List, Tuple, TypeVar
+from config import TTS_MAX_CONCURRENCY, TTS_MAX_QUEUE_DEPTH
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Lower value runs first
+PRIORITY_LIVE = 0  # a caller is on the line waiting for this audio
+PRIORITY_PRESYNTH = 1  # pre-synthesis while the call is still ringing
+PRIORITY_WARMUP = 2  # cache warmups (prompts, planned campaigns)
+
+PRIORITY_NAMES = {
+    PRIORITY_LIVE: "live",
+    PRIORITY_PRESYNTH: "presynth",
+    PRIORITY_WARMUP: "warmup",
+}
+
+
+class QueueFullError(Exception):
+    """Raised when low-priority work is rejected because the queue is full"""
+
+
+class TTSScheduler:
+    """
+    Bounded-concurrency priority scheduler for upstream TTS requests
+
+    At most max_concurrency requests run at once; the rest wait in a priority
+    queue (FIFO within a priority). When max_queue_depth requests are already
+    waiting, new non-live work is rejected instead of queued.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue_depth: int):
+        self.max_concurrency = max_concurrency
+        self.max_queue_depth = max_queue_depth
+        self.active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    def _update_gauges(self):
+        metrics.set_gauge("tts_queue_depth", len(self._waiters))
+        metrics.set_gauge("tts_active_requests", self.active)
+
+    async def _acquire(self, priority: int):
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            return
+
+        if priority != PRIORITY_LIVE and len(self._waiters) >= self.max_queue_depth:
+            metrics.increment(f"tts_queue_rejected.{PRIORITY_NAMES[priority]}")
+            raise QueueFullError(
+                f"TTS queue is full ({len(self._waiters)} waiting), "
+                f"rejecting {PRIORITY_NAMES[priority]} work"
+            )
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+        self._update_gauges()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # We were handed a slot just as we got cancelled; pass it on
+                self._release()
+            else:
+                self._waiters = [w for w in self._waiters if w[2] is not waiter]
+                heapq.heapify(self._waiters)
+                self._update_gauges()
+            raise
+
+    def _release(self):
+        # Hand the slot straight to the highest-priority waiter, if any
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                self._update_gauges()
+                return
+        self.active -= 1
+        self._update_gauges()
+
+    async def run(self, priority: int, func: Callable[[], Awaitable[T]]) -> T:
+        """Run func once a slot is free, ahead of lower-priority work"""
+        start = time.perf_counter()
+        await self._acquire(priority)
+        metrics.observe(
+            f"tts_queue_wait_ms.{PRIORITY_NAMES[priority]}",
+            (time.perf_counter() - start) * 1000,
+        )
+        self._update_gauges()
+        try:
+            return await func()
+        finally:
+            self._release()
+
+
+tts_scheduler = TTSScheduler(TTS_MAX_CONCURRENCY, TTS_MAX_QUEUE_DEPTH)
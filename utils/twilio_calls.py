@@ -0,0 +1,84 @@
+import time
+import asyncio
+import logging
+import aiohttp
+from typing import Awaitable, Callable, Optional
+from config import twilio_client, TWILIO_TIMEOUT, TWILIO_MAX_CONNECTIONS
+from utils import metrics
+from utils.call_pacing import call_pacer
+
+logger = logging.getLogger(__name__)
+
+
+class CallOutcomeUnknownError(Exception):
+    """The create-call request may have reached Twilio, but no answer came back"""
+
+
+async def start_client():
+    """
+    Open the pooled aiohttp session used for Twilio REST requests
+
+    Without it the async Twilio HTTP client opens a new session (and TLS
+    connection) for every request.
+    """
+    if twilio_client is None or twilio_client.http_client.session is not None:
+        return
+    twilio_client.http_client.session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=TWILIO_MAX_CONNECTIONS)
+    )
+    logger.info(f"Twilio client using {twilio_client.api.base_url}")
+
+
+async def close_client():
+    """Close the Twilio connection pool"""
+    if twilio_client is None or twilio_client.http_client.session is None:
+        return
+    await twilio_client.http_client.close()
+    twilio_client.http_client.session = None
+
+
+async def create_call(
+    url: str,
+    to: str,
+    from_: str,
+    max_wait: Optional[float] = None,
+    before_request: Optional[Callable[[], Awaitable[None]]] = None,
+):
+    """
+    Place an outbound call without blocking the event loop
+
+    Waits first for a slot under the account's and caller ID's CPS limits,
+    or raises PacingDelayError if that is more than max_wait seconds away,
+    then awaits before_request (if given) right before the request is sent.
+    Returns Twilio's call instance. Raises on API errors, and raises
+    CallOutcomeUnknownError when the request may have been sent but Twilio
+    didn't answer (within TWILIO_TIMEOUT seconds, or at all), since the call
+    may then have been placed.
+    """
+    await call_pacer.wait_for_slot(from_, max_wait)
+    if before_request is not None:
+        await before_request()
+    start = time.perf_counter()
+    try:
+        return await asyncio.wait_for(
+            twilio_client.calls.create_async(url=url, to=to, from_=from_),
+            TWILIO_TIMEOUT,
+        )
+    except (aiohttp.ClientConnectorError, aiohttp.ConnectionTimeoutError):
+        # Never connected, so nothing was sent
+        metrics.increment("twilio_call_create_failures")
+        raise
+    except asyncio.TimeoutError:
+        metrics.increment("twilio_call_create_failures")
+        raise CallOutcomeUnknownError(
+            f"Twilio didn't answer within {TWILIO_TIMEOUT:g}s"
+        )
+    except aiohttp.ClientError as e:
+        # Connection dropped after the request may have gone out
+        metrics.increment("twilio_call_create_failures")
+        raise CallOutcomeUnknownError(f"No answer from Twilio: {str(e)}")
+    except Exception:
+        metrics.increment("twilio_call_create_failures")
+        raise
+    finally:
+        metrics.observe("twilio_call_create_ms", (time.perf_counter() - start) * 1000)